@@ -1,53 +1,180 @@
 import argparse
-import re
+import os
 import json
+import time
+from functools import partial
 import messages
+from options import build_parser
+from cache import AuthorizationCache, CFPCache
+from indexer import CFPIndexer
+from index_store import IndexStore
+from transactions import SharedNonceManager, TransactionPipeline
+from receipts import ReceiptPoller
+from signatures import SignatureRecovery
+from rpc_batch import RPCClient, pooled_session
+from multicall import Multicall
+from chain_head import HeadTracker
+from artifacts import Artifact, preload
+from metrics import Registry, RPCMetrics
+from profiling import RequestProfiler
+from serializer import ResponseCache, hex_many
+from timefmt import isoformat, isoformat_many
+from validation import checksum, is_valid_address, is_valid_call_id, is_valid_hash, is_valid_signature
 from web3 import Web3, HTTPProvider
 from eth_account import Account
-from eth_account.messages import encode_defunct
 from datetime import datetime
-from flask import Flask, request, jsonify
-from pytz import timezone
+from flask import Flask, Response, abort, g, request, jsonify, send_from_directory, stream_with_context
 from flask import make_response
 import argparse
 from flask_cors import CORS, cross_origin
 
 
 empty = "0x0000000000000000000000000000000000000000"
-parser = argparse.ArgumentParser()
-mnemonic_route = "mnemonic.txt"
-parser.add_argument('--mnemonic', help = "Mnemonic file name or route", default=mnemonic_route)
-parser.add_argument('--gport', help = "Ganache port number", default=7545)
-parser.add_argument('--network', help = "Ganache Network ID", default=5777)
-parser.add_argument('--build', help = "Route to the folder that contains build folder", default="../6")
-args = parser.parse_args()
+# Largest page accepted by /calls, and number of calls read from the index at a time while paging
+MAX_PAGE_SIZE = 1000
+PAGE_CHUNK = 100
+# Seconds a request waits for the pipeline to hand its transaction to the node
+TX_SEND_TIMEOUT = 30
+# Largest number of registrations accepted by /register/batch
+MAX_BATCH_SIZE = 500
+args = build_parser().parse_args()
 network = str(args.network)
 app = Flask(__name__)
 cors = CORS(app)
 app.config['CORS_HEADERS'] = 'Content-Type'
-w3 = Web3(HTTPProvider('http://localhost:' + str(args.gport)))
-fCFPFactory = args.build + "/build/contracts/CFPFactory.json"
-fPublicResolver = args.build + "/build/contracts/PublicResolver.json"
-fUserFIFSRegistrar = args.build + "/build/contracts/UserFIFSRegistrar.json"
-
-with open(fCFPFactory) as f:
-    cfp_factory = json.load(f)
-    cfp_abi = cfp_factory['abi']
-    cfp_address = cfp_factory['networks'][network]['address']
-    print("CFPFactory address: ", cfp_address)
-    cfp_factory_contract = w3.eth.contract(address=cfp_address, abi=cfp_abi)
-
-with open(fPublicResolver) as f:
-    public_resolver = json.load(f)
-    public_resolver_abi = public_resolver['abi']
-    public_resolver_address = public_resolver['networks'][network]['address']
-    public_resolver_contract = w3.eth.contract(address=public_resolver_address, abi=public_resolver_abi)
-
-with open(fUserFIFSRegistrar) as f:
-    user_fifs_registrar = json.load(f)
-    user_fifs_registrar_abi = user_fifs_registrar['abi']
-    user_fifs_registrar_address = user_fifs_registrar['networks'][network]['address']
-    user_fifs_registrar_contract = w3.eth.contract(address=user_fifs_registrar_address, abi=user_fifs_registrar_abi)
+# Request and node RPC latencies, exposed at /metrics with the state of caches and transactions
+registry = Registry()
+rpc_metrics = RPCMetrics(registry)
+request_latency = registry.histogram(
+    "cfp_http_request_seconds", "Time taken to answer HTTP requests.", ("method", "route", "status"))
+
+node_uri = 'http://localhost:' + str(args.gport)
+# web3 and the batch client share one pool of keep-alive connections to the node
+rpc_session = pooled_session()
+w3 = Web3(HTTPProvider(node_uri, session=rpc_session))
+w3.middleware_onion.add(rpc_metrics.middleware, name="metrics")
+rpc = RPCClient(w3, node_uri, rpc_session, observe=rpc_metrics.observe_batch)
+contracts_dir = args.build + "/build/contracts/"
+
+# Only the ABI and addresses of the artifacts are read, from a compact cache when they have not changed,
+# and contract objects are built the first time a request uses them
+cfp_factory_artifact = Artifact(contracts_dir + "CFPFactory.json", network)
+public_resolver_artifact = Artifact(contracts_dir + "PublicResolver.json", network)
+user_fifs_registrar_artifact = Artifact(contracts_dir + "UserFIFSRegistrar.json", network)
+cfp_artifact = Artifact(contracts_dir + "CFP.json")
+multicall_artifact = Artifact(contracts_dir + "Multicall.json", network)
+preload([cfp_factory_artifact, public_resolver_artifact, user_fifs_registrar_artifact])
+
+cfp_address = cfp_factory_artifact.address
+print("CFPFactory address: ", cfp_address)
+cfp_factory_contract = cfp_factory_artifact.contract(w3)
+public_resolver_contract = public_resolver_artifact.contract(w3)
+user_fifs_registrar_contract = user_fifs_registrar_artifact.contract(w3)
+
+# Bulk endpoints read through the Multicall contract, or with JSON-RPC batches if it is not deployed
+multicall = Multicall(w3, rpc, multicall_artifact, args.multicall_chunk)
+
+# The CFP ABI is loaded once; contract objects and call records are cached by address and callId
+cfp_cache = CFPCache(w3, cfp_artifact, args.cache_size, args.negative_ttl)
+authorization_cache = AuthorizationCache(cfp_factory_contract, args.cache_size * 4, args.negative_ttl)
+
+# Read endpoints are served from this index of CFPFactory/CFP events once it has caught up
+index_store = IndexStore(args.index_db, cfp_address) if args.index_db and not args.no_index else None
+indexer = CFPIndexer(w3, cfp_factory_contract, cfp_cache, args.confirmations, args.index_interval, store=index_store)
+indexer.subscribe_reset(multicall.invalidate)
+
+# Latest block header, refreshed by a background thread so handlers do not have to ask the node for it
+head_tracker = HeadTracker(w3, args.head_interval)
+head_tracker.subscribe(lambda header: indexer.notify())
+
+# Encoded bodies of /calls, /creators, /pending and /createdBy, reused while the data they came from is unchanged
+list_responses = ResponseCache(args.cache_size)
+
+# Follows the transactions of write requests until they are mined. /creators and /pending are
+# versioned by the chain head, which is polled, so they are also discarded once a write is mined
+receipt_poller = ReceiptPoller(w3)
+receipt_poller.subscribe(list_responses.invalidate)
+
+# ECDSA recovery of the signers of /create and /register runs in a shared pool of processes
+signature_recovery = SignatureRecovery(args.recovery_workers, ttl=args.signature_ttl)
+
+# Node requests are labelled with the functions of these contracts, once their artifacts are loaded
+rpc_metrics.register_artifact("CFPFactory", cfp_factory_artifact)
+rpc_metrics.register_artifact("PublicResolver", public_resolver_artifact)
+rpc_metrics.register_artifact("UserFIFSRegistrar", user_fifs_registrar_artifact)
+rpc_metrics.register_artifact("CFP", cfp_artifact)
+rpc_metrics.register_artifact("Multicall", multicall_artifact)
+
+def cache_samples(kind):
+    """Hit, miss or size counts of every in-memory cache."""
+    caches = {**cfp_cache.stats(), "unauthorized": authorization_cache.stats(), "signatures": signature_recovery.cache.stats(),
+              "responses": list_responses.stats()}
+    return [((cache,), stats[kind]) for cache, stats in caches.items()]
+
+registry.callback("cfp_cache_hits_total", "Lookups answered by each cache.", "counter", ("cache",),
+                  lambda: cache_samples("hits"))
+registry.callback("cfp_cache_misses_total", "Lookups not found in each cache.", "counter", ("cache",),
+                  lambda: cache_samples("misses"))
+registry.callback("cfp_cache_entries", "Entries held by each cache.", "gauge", ("cache",),
+                  lambda: cache_samples("size"))
+registry.callback("cfp_jobs_outstanding", "Asynchronous write jobs whose transactions are not mined yet.", "gauge", (),
+                  lambda: [((), receipt_poller.outstanding())])
+registry.callback("cfp_head_lag_seconds", "Seconds between the timestamp of the chain head and the clock of the server.", "gauge", (),
+                  lambda: [((), head_tracker.stats().get("headLag"))])
+registry.callback("cfp_index_last_block", "Last block indexed by the event indexer.", "gauge", (),
+                  lambda: [((), indexer.last_block)])
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    if "request_start" in g:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        request_latency.observe((request.method, route, str(response.status_code)), time.perf_counter() - g.request_start)
+    return response
+
+@app.get('/metrics')
+def metrics():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+profiler = None
+if args.profile:
+    profiler = RequestProfiler(args.profile_dir, args.profile_rate, args.profile_threshold, args.profile_keep)
+    profiler.install(app)
+
+@app.get('/profiles')
+def profiles():
+    """
+    Lists the slowest saved request profiles, with the functions that took the most time in each.
+    Accepts `limit` (default 20) and `route` (e.g. `/calls`) as query parameters.
+    """
+    if profiler is None:
+        return make_response(jsonify({"profiles": []}), 200)
+    limit = request.args.get("limit", "20")
+    if not limit.isdigit():
+        return make_response(jsonify({"message": messages.INVALID_PAGINATION}), 400)
+    return make_response(jsonify({"profiles": profiler.summaries(int(limit), request.args.get("route"))}), 200)
+
+@app.get('/profiles/<name>.prof')
+def profile_file(name):
+    if profiler is None:
+        abort(404)
+    return send_from_directory(os.path.abspath(args.profile_dir), name + ".prof")
+
+def data_version(indexed):
+    """
+    Version of the data a list response is built from: the version of the index, or the
+    hash of the chain head when it is read from the node. None if the head is not known.
+    """
+    if indexed:
+        return ("index", indexer.version)
+    head = head_tracker.latest()
+    return None if head is None else ("head", head["hash"])
+
+def index_ready():
+    return not args.no_index and indexer.ready
 
 @app.post('/create')
 def create():
@@ -73,7 +200,7 @@ def create():
     closing_time = data['closingTime']
     signature = data['signature']
     
-    if not (all(c in "0123456789abcdefABCDEF" for c in signature[2:]) and len(signature[2:]) == 130):
+    if not is_valid_signature(signature):
         return jsonify({'message': messages.INVALID_SIGNATURE}), 400, {"Content-Type": "application/json"}
     
     if not is_valid_call_id(call_id):
@@ -86,26 +213,54 @@ def create():
         return jsonify({'message': messages.INVALID_TIME_FORMAT}), 400, {"Content-Type": "application/json"}
     
     message_bytes = w3.to_bytes(hexstr=cfp_address[2:] + call_id[2:])
-    owner_address = w3.eth.account.recover_message(encode_defunct(message_bytes), signature=signature)
-    owner_is_authorized = cfp_factory_contract.functions.isAuthorized(w3.to_checksum_address(owner_address.lower())).call()
-    
+    owner_address = signature_recovery.recover(message_bytes, signature)
+    owner_address = checksum(owner_address)
+
+    if authorization_cache.known_unauthorized(owner_address):
+        return jsonify({'message': messages.UNAUTHORIZED}), 403, {"Content-Type": "application/json"}
+
+    # The authorization and the call record are read in a single round-trip, along with
+    # the latest block only if the head tracker has not got a recent one
+    batch = rpc.batch()
+    batch.call(cfp_factory_contract.functions.isAuthorized(owner_address))
+    cfp = cfp_cache.cached_call(call_id)
+    if cfp is None:
+        batch.call(cfp_factory_contract.functions.calls(call_id))
+    latest = head_tracker.latest()
+    if latest is None:
+        batch.get_block("latest")
+    results = batch.execute()
+    owner_is_authorized = results[0]
+    if latest is None:
+        latest = results[-1]
+    authorization_cache.record(owner_address, owner_is_authorized)
+    if cfp is None:
+        cfp = results[1]
+        cfp_cache.record_call(call_id, cfp)
+
     if not owner_is_authorized:
         return jsonify({'message': messages.UNAUTHORIZED}), 403, {"Content-Type": "application/json"}
     
-    cfp = cfp_factory_contract.functions.calls(call_id).call()
-    
     if (cfp[0] != empty):
         return jsonify({"message": messages.ALREADY_CREATED}), 403, {"Content-Type": "application/json"}
 
-    if w3.eth.get_block("latest").timestamp >= closing_time.timestamp():
+    if latest["timestamp"] >= closing_time.timestamp():
         return jsonify({'message': messages.INVALID_CLOSING_TIME}), 400, {"Content-Type": "application/json"}
 
+    function = cfp_factory_contract.functions.createFor(call_id, int(closing_time.timestamp()), owner_address)
+
+    def created():
+        cfp_cache.forget_missing(call_id)
+        indexer.notify()
+
     try:
-        cfp_factory_contract.functions.createFor(call_id, int(closing_time.timestamp()), owner_address).transact({"from": owner.address})
+        if respond_async():
+            return accepted(tx_pipeline.submit(function), on_mined=created)
+        tx_hash = send_transaction(function, on_mined=created)
     except Exception as e:
         return jsonify({"message": messages.INTERNAL_ERROR}), 500, {"Content-Type": "application/json"}
 
-    return jsonify({"message": messages.OK}), 201, {"Content-Type": "application/json"}
+    return jsonify({"message": messages.OK, "transactionHash": tx_hash}), 201, {"Content-Type": "application/json"}
     
 @app.post('/register')
 def register():
@@ -126,28 +281,108 @@ def register():
     if not is_valid_address(address):
         return jsonify({"message": messages.INVALID_ADDRESS}), 400, {"Content-Type": "application/json"}
 
-    if not (all(c in "0123456789abcdefABCDEF" for c in signature[2:]) and len(signature[2:])==130):
+    if not is_valid_signature(signature):
         return jsonify({"message": messages.INVALID_SIGNATURE}), 400, {"Content-Type": "application/json"}
     
     contract_address_bytes = w3.to_bytes(hexstr = cfp_address[2:])
-    encoder = encode_defunct(contract_address_bytes)
-    addressRecovered = w3.eth.account.recover_message(encoder, signature=signature)
-    address = w3.to_checksum_address(address.lower())
+    addressRecovered = signature_recovery.recover(contract_address_bytes, signature)
+    address = checksum(address)
    
     
     if addressRecovered != address:
         return jsonify({"message": messages.INVALID_SIGNATURE}), 400, {"Content-Type": "application/json"}
 
-    is_authorized = cfp_factory_contract.functions.isAuthorized(w3.to_checksum_address(address.lower())).call()
+    is_authorized = authorization_cache.is_authorized(checksum(address))
     if is_authorized:
         return jsonify({"message": messages.ALREADY_AUTHORIZED}), 403, {"Content-Type": "application/json"}
 
+    function = cfp_factory_contract.functions.authorize(checksum(address))
     try:
-        cfp_factory_contract.functions.authorize(w3.to_checksum_address(address)).transact({"from": owner.address})
+        if respond_async():
+            return accepted(tx_pipeline.submit(function), on_mined=partial(authorization_cache.forget, address))
+        tx_hash = send_transaction(function, on_mined=partial(authorization_cache.forget, address))
     except Exception as e:
         return jsonify({"message": messages.INTERNAL_ERROR}), 500, {"Content-Type": "application/json"}
 
-    return jsonify(message = messages.OK), 200, {"Content-Type": "application/json"}
+    return jsonify(message = messages.OK, transactionHash = tx_hash), 200, {"Content-Type": "application/json"}
+    
+@app.post('/register/batch')
+def register_batch():
+    """
+    Register many users at once.
+
+    The payload is a JSON object with a `registrations` field: a list of objects with
+    the same `address` and `signature` fields as `/register`. Signers are recovered
+    in parallel, and every valid registration is authorized.
+
+    Returns:
+        A JSON response with a `results` list holding, for each registration in order,
+        its `address`, the `status` code and `message` that `/register` would have
+        returned, and the `transactionHash` when it was authorized.
+    """
+    if not is_valid_mimetype(request.mimetype):
+        return make_response(jsonify({"message": messages.INVALID_MIMETYPE}), 400)
+
+    data = request.get_json(silent=True)
+    registrations = data.get('registrations') if isinstance(data, dict) else None
+    if not isinstance(registrations, list) or not 0 < len(registrations) <= MAX_BATCH_SIZE:
+        return make_response(jsonify({"message": messages.INVALID_BATCH}), 400)
+
+    results = []
+    to_recover = []
+    contract_address_bytes = w3.to_bytes(hexstr = cfp_address[2:])
+    for item in registrations:
+        address = item.get('address') if isinstance(item, dict) else None
+        signature = item.get('signature') if isinstance(item, dict) else None
+        result = {"address": address}
+        results.append(result)
+        if not isinstance(address, str) or not is_valid_address(address):
+            result.update(status=400, message=messages.INVALID_ADDRESS)
+        elif not is_valid_signature(signature):
+            result.update(status=400, message=messages.INVALID_SIGNATURE)
+        else:
+            to_recover.append((result, checksum(address), signature))
+
+    recovered = signature_recovery.recover_many([(contract_address_bytes, signature) for _, _, signature in to_recover])
+
+    # Every isAuthorized check that is not known to be negative goes to the node in one batch
+    to_check = list(dict.fromkeys(address for (_, address, _), signer in zip(to_recover, recovered)
+                                  if signer == address and not authorization_cache.known_unauthorized(address)))
+    batch = rpc.batch()
+    for address in to_check:
+        batch.call(cfp_factory_contract.functions.isAuthorized(address))
+    authorized = dict(zip(to_check, batch.execute()))
+    for address, is_authorized in authorized.items():
+        authorization_cache.record(address, is_authorized)
+
+    # One authorize transaction per address: repeated registrations share the result of the first
+    pending = {}
+    for (result, address, _), signer in zip(to_recover, recovered):
+        if signer != address:
+            result.update(status=400, message=messages.INVALID_SIGNATURE)
+        elif authorized.get(address, False):
+            result.update(status=403, message=messages.ALREADY_AUTHORIZED)
+        elif address in pending:
+            pending[address][0].append(result)
+        else:
+            try:
+                transaction = tx_pipeline.submit(cfp_factory_contract.functions.authorize(address))
+                receipt_poller.track(transaction, on_mined=partial(authorization_cache.forget, address))
+                pending[address] = ([result], transaction)
+            except Exception:
+                result.update(status=500, message=messages.INTERNAL_ERROR)
+
+    for address, (address_results, transaction) in pending.items():
+        try:
+            outcome = dict(status=200, message=messages.OK, transactionHash=w3.to_hex(transaction.wait(TX_SEND_TIMEOUT)))
+            authorization_cache.forget(address)
+            list_responses.invalidate()
+        except Exception:
+            outcome = dict(status=500, message=messages.INTERNAL_ERROR)
+        for result in address_results:
+            result.update(outcome)
+
+    return make_response(jsonify({"results": results}), 200)
     
 @app.post('/register-proposal')
 @cross_origin()
@@ -171,7 +406,7 @@ def register_proposal():
     if not is_valid_call_id(call_id):
         return jsonify({"message": messages.INVALID_CALLID}), 400
     
-    cfp = cfp_factory_contract.functions.calls(call_id).call()
+    cfp = cfp_cache.call(cfp_factory_contract, call_id)
 
     if (cfp[0] == empty):
         return jsonify({"message": messages.CALLID_NOT_FOUND}), 404
@@ -179,48 +414,87 @@ def register_proposal():
     if not is_valid_call_id(proposal):
         return jsonify({"message": messages.INVALID_PROPOSAL}), 400
     
-    with open(args.build + "/build/contracts/CFP.json") as f:
-        cfp_data = json.load(f)
-        abi = cfp_data['abi']
-        
-        cfp_contract = w3.eth.contract(address=cfp[1], abi=abi)
+    cfp_contract = cfp_cache.contract(cfp[1])
 
     proposal_data = cfp_contract.functions.proposalData(proposal).call()
     
     if not was_cfp_created(proposal_data[0]):
         return jsonify({"message": messages.ALREADY_REGISTERED}), 403
     
+    function = cfp_contract.functions.registerProposal(proposal)
     try:
-        cfp_contract.functions.registerProposal(proposal).transact({"from": owner.address})
+        if respond_async():
+            return accepted(tx_pipeline.submit(function), on_mined=indexer.notify)
+        tx_hash = send_transaction(function)
     except Exception as e:
         return jsonify({"message": str(e)}), 500
-    print("Proposal registered" + proposal + " for call " + call_id)
-    return jsonify({"message": messages.OK}), 201
+    indexer.notify()
+    return jsonify({"message": messages.OK, "transactionHash": tx_hash}), 201
 
 @app.get('/authorized/<address>')
 def authorized(address):
         if not is_valid_address(address):
                 return make_response(jsonify({"message": messages.INVALID_ADDRESS}), 400)
         
-        response_body = cfp_factory_contract.functions.isAuthorized(w3.to_checksum_address(address)).call()
+        response_body = authorization_cache.is_authorized(checksum(address))
         
         return make_response(jsonify({"authorized": response_body}), 200)
 
+@app.post('/authorized')
+def authorized_many():
+    """
+    Check whether many addresses are authorized to create calls.
+
+    The payload is a JSON object with an `addresses` list (up to 500 items).
+
+    Returns:
+        A JSON response with a `results` list holding, for each address in order,
+        the `address` and whether it is `authorized`, or a `message` if it is invalid.
+    """
+    addresses = bulk_items('addresses')
+    if addresses is None:
+        return make_response(jsonify({"message": messages.INVALID_BATCH}), 400)
+
+    results = [{"address": address} for address in addresses]
+    to_check = []
+    for result in results:
+        if not isinstance(result["address"], str) or not is_valid_address(result["address"]):
+            result["message"] = messages.INVALID_ADDRESS
+            continue
+        address = checksum(result["address"])
+        if authorization_cache.known_unauthorized(address):
+            result["authorized"] = False
+        else:
+            to_check.append((result, address))
+
+    checked = multicall.call([cfp_factory_contract.functions.isAuthorized(address) for _, address in to_check])
+    for (result, address), is_authorized in zip(to_check, checked):
+        if is_authorized is None:
+            result["message"] = messages.INTERNAL_ERROR
+            continue
+        authorization_cache.record(address, is_authorized)
+        result["authorized"] = is_authorized
+
+    return make_response(jsonify({"results": results}), 200)
+
 @app.post('/authorize/<address>')
 def authorize(address):
         if not is_valid_address(address):
                 return make_response(jsonify({"message": messages.INVALID_ADDRESS}), 400)
         
-        is_authorized = cfp_factory_contract.functions.isAuthorized(w3.to_checksum_address(address)).call()
+        is_authorized = authorization_cache.is_authorized(checksum(address))
         if is_authorized:
                 return make_response(jsonify({"message": messages.ALREADY_AUTHORIZED}), 403)
         
+        function = cfp_factory_contract.functions.authorize(checksum(address))
         try:
-                cfp_factory_contract.functions.authorize(w3.to_checksum_address(address)).transact({"from": owner.address})
+                if respond_async():
+                        return accepted(tx_pipeline.submit(function), on_mined=partial(authorization_cache.forget, checksum(address)))
+                tx_hash = send_transaction(function, on_mined=partial(authorization_cache.forget, checksum(address)))
         except Exception as e:
                 return make_response(jsonify({"message": str(e)}), 500)
         
-        return make_response(jsonify({"message": messages.OK}), 200)
+        return make_response(jsonify({"message": messages.OK, "transactionHash": tx_hash}), 200)
 
 @app.post('/unauthorize/<address>')
 @cross_origin()
@@ -228,23 +502,62 @@ def unauthorize(address):
         if not is_valid_address(address):
                 return make_response(jsonify({"message": messages.INVALID_ADDRESS}), 400)
         
-        is_authorized = cfp_factory_contract.functions.isAuthorized(w3.to_checksum_address(address)).call()
+        is_authorized = authorization_cache.is_authorized(checksum(address))
         if not is_authorized:
                 return make_response(jsonify({"message": messages.NOT_AUTHORIZED}), 403)
         
+        function = cfp_factory_contract.functions.unauthorize(checksum(address))
         try:
-                cfp_factory_contract.functions.unauthorize(w3.to_checksum_address(address)).transact({"from": owner.address})
+                if respond_async():
+                        return accepted(tx_pipeline.submit(function), on_mined=partial(authorization_cache.forget, checksum(address)))
+                tx_hash = send_transaction(function, on_mined=partial(authorization_cache.forget, checksum(address)))
         except Exception as e:
                 return make_response(jsonify({"message": str(e)}), 500)
         
-        return make_response(jsonify({"message": messages.OK}), 200)
+        return make_response(jsonify({"message": messages.OK, "transactionHash": tx_hash}), 200)
+
+@app.get('/transactions/<tx_hash>')
+@cross_origin()
+def transaction_status(tx_hash):
+        """
+        Reports the state of a transaction sent by the server: pending, mined, reverted or dropped.
+        """
+        if not is_valid_hash(tx_hash):
+                return make_response(jsonify({"message": messages.INVALID_TRANSACTION}), 400)
+        
+        status = tx_pipeline.status(w3.to_bytes(hexstr=tx_hash))
+        if status is None:
+                return make_response(jsonify({"message": messages.TRANSACTION_NOT_FOUND}), 404)
+        
+        return make_response(jsonify(status), 200)
+
+@app.get('/jobs/<job_id>')
+@cross_origin()
+def job_status(job_id):
+        """
+        Reports the state of an asynchronous write: queued, pending, mined, failed or reverted.
+        Reverted jobs include the revert reason.
+        """
+        job = receipt_poller.get(job_id)
+        if job is None:
+                return make_response(jsonify({"message": messages.JOB_NOT_FOUND}), 404)
+        
+        return make_response(jsonify(job.to_json()), 200)
 
 @app.get('/calls/<call_id>')
 def get_call(call_id):
         if not is_valid_call_id(call_id):
                 return make_response(jsonify({"message": messages.INVALID_CALLID}), 400)
         
-        cfp = cfp_factory_contract.functions.calls(call_id).call()
+        indexed = indexer.get_call(call_id) if index_ready() else None
+        if indexed:
+                return make_response(jsonify({
+                        "creator": indexed["creator"],
+                        "cfp": indexed["cfp"],
+                }), 200)
+        
+        # Calls not yet indexed (or not confirmed) are looked up in the node
+        cfp = cfp_cache.call(cfp_factory_contract, call_id)
         
         if (cfp[0] == empty):
                 return make_response(jsonify({"message": messages.CALLID_NOT_FOUND}), 404)
@@ -259,28 +572,41 @@ def closing_time(call_id):
         if not is_valid_call_id(call_id):
                 return make_response(jsonify({"message": messages.INVALID_CALLID}), 400)
         
-        cfp = cfp_factory_contract.functions.calls(call_id).call()
-        
-        if (cfp[0] == empty):
-                return make_response(jsonify({"message": messages.CALLID_NOT_FOUND}), 404)
-        
-        # Need to access the CFP contract to get more information
-        with open(args.build + "/build/contracts/CFP.json") as f:
-                cfp_data = json.load(f)
-                abi = cfp_data['abi']
+        indexed = indexer.get_call(call_id) if index_ready() else None
+        if indexed:
+                closing_time = indexed["closingTime"]
+        else:
+                cfp = cfp_cache.call(cfp_factory_contract, call_id)
                 
-                cfp_contract = w3.eth.contract(address=cfp[1], abi=abi)
+                if (cfp[0] == empty):
+                        return make_response(jsonify({"message": messages.CALLID_NOT_FOUND}), 404)
                 
-        closing_time = cfp_contract.functions.closingTime().call()
-        closing_time = datetime.fromtimestamp(closing_time, timezone("America/Argentina/Buenos_Aires"))
-        
-        return make_response(jsonify({"closingTime": closing_time.isoformat()}), 200)
+                # Need to access the CFP contract to get more information
+                cfp_contract = cfp_cache.contract(cfp[1])
+                closing_time = cfp_contract.functions.closingTime().call()
+        return make_response(jsonify({"closingTime": isoformat(closing_time)}), 200)
         
 @app.get("/contract-address")
 @cross_origin()
 def contract_address():
         return make_response(jsonify({"address": cfp_address}), 200)
         
+@app.get('/cache-stats')
+def cache_stats():
+        return make_response(jsonify({
+                **cfp_cache.stats(),
+                "unauthorized": authorization_cache.stats(),
+                "signatures": signature_recovery.cache.stats(),
+        }), 200)
+
+@app.get('/index-stats')
+def index_stats():
+        return make_response(jsonify(indexer.stats()), 200)
+
+@app.get('/head-stats')
+def head_stats():
+        return make_response(jsonify(head_tracker.stats()), 200)
+
 @app.get('/contract-owner')
 def contract_owner():
         return make_response(jsonify({"address": owner.address}), 200)
@@ -303,35 +629,99 @@ def proposal_data(call_id, proposal):
     if not is_valid_call_id(call_id):
         return make_response(jsonify({"message": messages.INVALID_CALLID}), 400)
     
-    cfp = cfp_factory_contract.functions.calls(call_id).call()
-    
-    if (cfp[0] == empty):
-        return make_response(jsonify({"message": messages.CALLID_NOT_FOUND}), 404)
-    print(proposal)
+    indexed = indexer.get_call(call_id) if index_ready() else None
+    if indexed:
+        cfp_address = indexed["cfp"]
+    else:
+        cfp = cfp_cache.call(cfp_factory_contract, call_id)
+        
+        if (cfp[0] == empty):
+            return make_response(jsonify({"message": messages.CALLID_NOT_FOUND}), 404)
+        cfp_address = cfp[1]
     if (not is_valid_call_id(proposal)):
         return make_response(jsonify({"message": messages.INVALID_PROPOSAL}), 400)
     
-    # Connect to the CFP contract to retrieve the data
-    with open(args.build + "/build/contracts/CFP.json") as f:
-        cfp_data = json.load(f)
-        abi = cfp_data['abi']
-        
-        cfp_contract = w3.eth.contract(address=cfp[1], abi=abi)
+    indexed_proposal = indexer.get_proposal(cfp_address, proposal) if indexed else None
+    if indexed_proposal:
+        proposal_data = (indexed_proposal["sender"], indexed_proposal["blockNumber"], indexed_proposal["timestamp"])
+    else:
+        # Connect to the CFP contract to retrieve the data
+        cfp_contract = cfp_cache.contract(cfp_address)
 
-    ## Call the internal function of the contract
-    proposal_data = cfp_contract.functions.proposalData(proposal).call()
+        ## Call the internal function of the contract
+        proposal_data = cfp_contract.functions.proposalData(proposal).call()
 
     # If the proposal does not exist, return a 404
     if (proposal_data[0] == empty):
         return make_response(jsonify({"message": messages.PROPOSAL_NOT_FOUND}), 404)
     
-    closing_time = datetime.fromtimestamp(proposal_data[2], timezone("America/Argentina/Buenos_Aires"))             
     return make_response(jsonify({
-        "timestamp": closing_time.isoformat(),
+        "timestamp": isoformat(proposal_data[2]),
         "sender": str(proposal_data[0]),
         "blockNumber": proposal_data[1],
     }), 200)
 
+@app.post('/proposal-data/<call_id>')
+def proposal_data_many(call_id):
+    """
+    Retrieves the data of many proposals of a call.
+
+    The payload is a JSON object with a `proposals` list (up to 500 items).
+
+    Returns:
+    - response (dict): A JSON response with a `results` list holding, for each proposal in order,
+      the `proposal` and the same fields as `/proposal-data/<call_id>/<proposal>`,
+      or a `message` if it is invalid or was not found.
+    """
+    if not is_valid_call_id(call_id):
+        return make_response(jsonify({"message": messages.INVALID_CALLID}), 400)
+
+    proposals = bulk_items('proposals')
+    if proposals is None:
+        return make_response(jsonify({"message": messages.INVALID_BATCH}), 400)
+
+    indexed = indexer.get_call(call_id) if index_ready() else None
+    if indexed:
+        cfp_address = indexed["cfp"]
+    else:
+        cfp = cfp_cache.call(cfp_factory_contract, call_id)
+        if (cfp[0] == empty):
+            return make_response(jsonify({"message": messages.CALLID_NOT_FOUND}), 404)
+        cfp_address = cfp[1]
+
+    results = [{"proposal": proposal} for proposal in proposals]
+    found = []
+    to_read = []
+    for result in results:
+        if not isinstance(result["proposal"], str) or not is_valid_call_id(result["proposal"]):
+            result["message"] = messages.INVALID_PROPOSAL
+            continue
+        indexed_proposal = indexer.get_proposal(cfp_address, result["proposal"]) if indexed else None
+        if indexed_proposal:
+            found.append((result, (indexed_proposal["sender"], indexed_proposal["blockNumber"], indexed_proposal["timestamp"])))
+        else:
+            to_read.append(result)
+
+    cfp_contract = cfp_cache.contract(cfp_address)
+    read = multicall.call([cfp_contract.functions.proposalData(result["proposal"]) for result in to_read])
+    for result, data in zip(to_read, read):
+        if data is None:
+            result["message"] = messages.INTERNAL_ERROR
+        else:
+            found.append((result, data))
+
+    for result, data in found:
+        if data[0] == empty:
+            result["message"] = messages.PROPOSAL_NOT_FOUND
+            continue
+        result.update(
+            timestamp=isoformat(data[2]),
+            sender=str(data[0]),
+            blockNumber=data[1],
+        )
+
+    return make_response(jsonify({"results": results}), 200)
+
 @app.get('/pending')
 @cross_origin()
 def pending():
@@ -342,9 +732,8 @@ def pending():
         A JSON response containing the call IDs of all pending calls for proposals.
     """
     try:
-        pending = cfp_factory_contract.functions.getAllPending().call({"from": owner.address})
-
-        return make_response(jsonify({"pending": pending}), 200)
+        return list_responses.respond(data_version(False), lambda: {
+            "pending": cfp_factory_contract.functions.getAllPending().call({"from": owner.address})})
     except Exception as e:
         return make_response(jsonify({"message": str(e)}), 500)
 
@@ -358,12 +747,8 @@ def creators():
         A JSON response containing the addresses of all creators.
     """
     try:
-        creators = cfp_factory_contract.functions.getCreatorsList().call()
-        creators_list = []
-        for creator in creators:
-            creators_list.append(creator)
-        print(creators)
-        return make_response(jsonify({"creators": creators_list}), 200)
+        return list_responses.respond(data_version(False), lambda: {
+            "creators": list(cfp_factory_contract.functions.getCreatorsList().call())})
     except Exception as e:
         return make_response(jsonify({"message": str(e)}), 500)
     
@@ -387,11 +772,10 @@ def created_by(address):
         return make_response(jsonify({"message": messages.INVALID_ADDRESS}), 400)
     
     try:
-        calls = cfp_factory_contract.functions.callsByCreator(address).call()
-        calls_list = []
-        for call in calls:
-            calls_list.append(call.hex())
-        return make_response(jsonify({"calls": calls_list}), 200)
+        if index_ready():
+            return list_responses.respond(data_version(True), lambda: {"calls": indexer.calls_by(checksum(address))})
+        return list_responses.respond(data_version(False), lambda: {
+            "calls": hex_many(cfp_factory_contract.functions.callsByCreator(address).call())})
     except Exception as e:
         return make_response(jsonify({"message": str(e)}), 500)
 
@@ -400,30 +784,123 @@ def created_by(address):
 @cross_origin()
 def calls():
     """
-    Retrieves a list of all proposals.
+    Retrieves a list of all calls.
+
+    Query parameters (all optional):
+    - cursor: Position from which to continue, as returned in `nextCursor`.
+    - limit: Maximum number of calls to return (up to MAX_PAGE_SIZE).
+    - creator: Only return calls created by this address.
+    - closingAfter, closingBefore: Only return calls closing within this range (ISO format).
+    - format: `ndjson` to stream one call per line instead of a single JSON document.
+      Also selected with `Accept: application/x-ndjson`.
 
     Returns:
-        A JSON response containing the call IDs of all proposals.
+        A JSON response containing the calls, and `nextCursor` when paginating or filtering.
     """
+    paginated = any(param in request.args for param in ("cursor", "limit", "creator", "closingAfter", "closingBefore"))
+    try:
+        cursor = int(request.args.get("cursor", 0))
+        limit = int(request.args["limit"]) if "limit" in request.args else None
+        if cursor < 0 or (limit is not None and not 0 < limit <= MAX_PAGE_SIZE):
+            raise ValueError
+    except ValueError:
+        return make_response(jsonify({"message": messages.INVALID_PAGINATION}), 400)
 
+    creator = request.args.get("creator")
+    if creator is not None:
+        if not is_valid_address(creator):
+            return make_response(jsonify({"message": messages.INVALID_ADDRESS}), 400)
+        creator = checksum(creator)
 
     try:
-        calls = cfp_factory_contract.functions.getCallsList().call()
-        calls_list = []
-        for call in calls:
-            
-            calls_list.append(
-                 {
-                    "creator": call[0],
-                    "cfp": call[1],
-                    "callId": call[2].hex(),
-                    "closingTime": datetime.fromtimestamp(call[3], timezone("America/Argentina/Buenos_Aires")).isoformat(),
-                    })
-        
-        return make_response(jsonify({"callsList": calls_list}), 200)
+        closing_after = parse_time_arg("closingAfter")
+        closing_before = parse_time_arg("closingBefore")
+    except ValueError:
+        return make_response(jsonify({"message": messages.INVALID_TIME_FORMAT}), 400)
+
+    try:
+        if wants_ndjson():
+            matches = filter_calls(iter_calls(cursor), creator, closing_after, closing_before)
+            return Response(stream_with_context(ndjson_calls(matches, limit)), 200, mimetype="application/x-ndjson")
+
+        def build():
+            page = []
+            next_cursor = None
+            for position, call in filter_calls(iter_calls(cursor), creator, closing_after, closing_before):
+                if limit is not None and len(page) == limit:
+                    next_cursor = str(position)
+                    break
+                page.append(call)
+            if not paginated:
+                return {"callsList": calls_to_json(page)}
+            return {"callsList": calls_to_json(page), "nextCursor": next_cursor}
+
+        return list_responses.respond(data_version(index_ready()), build)
     except Exception as e:
         return make_response(jsonify({"message": str(e)}), 500)    
 
+def iter_calls(start):
+    """
+    Yields (position, (creator, cfp, callId, closingTime)) for every call from position `start` on.
+    The index is read a chunk at a time; without it, the whole list has to be read from the factory.
+    """
+    if index_ready():
+        position = start
+        while True:
+            chunk = indexer.calls_slice(position, position + PAGE_CHUNK)
+            if not chunk:
+                return
+            for call in chunk:
+                yield position, (call["creator"], call["cfp"], call["callId"], call["closingTime"])
+                position += 1
+    else:
+        calls = cfp_factory_contract.functions.getCallsList().call()[start:]
+        call_ids = hex_many([call[2] for call in calls])
+        for position, call, call_id in zip(range(start, start + len(calls)), calls, call_ids):
+            yield position, (call[0], call[1], call_id, call[3])
+
+def filter_calls(calls, creator=None, closing_after=None, closing_before=None):
+    """Filters the output of `iter_calls` by creator and closing time range."""
+    for position, call in calls:
+        if creator is not None and call[0] != creator:
+            continue
+        if closing_after is not None and call[3] < closing_after:
+            continue
+        if closing_before is not None and call[3] > closing_before:
+            continue
+        yield position, call
+
+def ndjson_calls(matches, limit):
+    """Writes each call as a JSON line as it is produced, followed by the next cursor if the page is full."""
+    count = 0
+    for position, call in matches:
+        if limit is not None and count == limit:
+            yield json.dumps({"nextCursor": str(position)}) + "\n"
+            return
+        count += 1
+        yield json.dumps(call_to_json(call)) + "\n"
+
+def call_to_json(call, closing_time=None):
+    return {
+        "creator": call[0],
+        "cfp": call[1],
+        "callId": call[2],
+        "closingTime": closing_time or isoformat(call[3]),
+    }
+
+def calls_to_json(calls):
+    closing_times = isoformat_many([call[3] for call in calls])
+    return [call_to_json(call, closing_time) for call, closing_time in zip(calls, closing_times)]
+
+def parse_time_arg(name):
+    """Returns the timestamp of the ISO formatted query parameter `name`, or None if it is missing."""
+    value = request.args.get(name)
+    return None if value is None else datetime.fromisoformat(value).timestamp()
+
+def wants_ndjson():
+    return (request.args.get("format") == "ndjson" or
+            request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"]) == "application/x-ndjson")
+
 @app.get('/registered/<address>')
 def registered(address):
     """
@@ -439,12 +916,87 @@ def registered(address):
         return make_response(jsonify({"message": messages.INVALID_ADDRESS}), 400)
 
     try:
-        is_registered = cfp_factory_contract.functions.isRegistered(w3.to_checksum_address(address)).call()
+        is_registered = cfp_factory_contract.functions.isRegistered(checksum(address)).call()
         return make_response(jsonify({"registered": is_registered}), 200)
     except Exception as e:
         return make_response(jsonify({"message": str(e)}), 500)
 
-    
+@app.post('/registered')
+def registered_many():
+    """
+    Check whether many addresses are registered.
+
+    The payload is a JSON object with an `addresses` list (up to 500 items).
+
+    Returns:
+        A JSON response with a `results` list holding, for each address in order,
+        the `address` and whether it is `registered`, or a `message` if it is invalid.
+    """
+    addresses = bulk_items('addresses')
+    if addresses is None:
+        return make_response(jsonify({"message": messages.INVALID_BATCH}), 400)
+
+    results = [{"address": address} for address in addresses]
+    to_check = []
+    for result in results:
+        if not isinstance(result["address"], str) or not is_valid_address(result["address"]):
+            result["message"] = messages.INVALID_ADDRESS
+        else:
+            to_check.append(result)
+
+    checked = multicall.call([cfp_factory_contract.functions.isRegistered(checksum(result["address"]))
+                              for result in to_check])
+    for result, is_registered in zip(to_check, checked):
+        if is_registered is None:
+            result["message"] = messages.INTERNAL_ERROR
+        else:
+            result["registered"] = is_registered
+
+    return make_response(jsonify({"results": results}), 200)
+
+def bulk_items(field):
+    """Returns the list in `field` of the JSON payload of a bulk request, or None if it is missing or too long."""
+    if not is_valid_mimetype(request.mimetype):
+        return None
+    items = (request.get_json(silent=True) or {}).get(field)
+    if not isinstance(items, list) or not 0 < len(items) <= MAX_BATCH_SIZE:
+        return None
+    return items
+
+def send_transaction(function, on_mined=None):
+    """
+    Queues a call to the contract function `function`, signed by the owner, in the transaction
+    pipeline and waits until the node accepts it. Returns the transaction hash.
+    `on_mined` is called as soon as the node accepts the transaction, so that the client
+    reads its own write, and again once the transaction is mined. The cached list
+    responses are discarded at both points too.
+    """
+    pending = tx_pipeline.submit(function)
+    receipt_poller.track(pending, on_mined=on_mined)
+    tx_hash = w3.to_hex(pending.wait(TX_SEND_TIMEOUT))
+    list_responses.invalidate()
+    if on_mined is not None:
+        on_mined()
+    return tx_hash
+
+def respond_async():
+    """
+    Whether a write request should be answered with 202 before its transaction is mined.
+    Clients choose with `?async=true|false` or `Prefer: respond-async`; `--async-writes` sets the default.
+    """
+    if "async" in request.args:
+        return request.args["async"].lower() in ("1", "true", "yes")
+    return args.async_writes or "respond-async" in request.headers.get("Prefer", "")
+
+def accepted(pending, on_mined=None):
+    """
+    Tracks a PendingTransaction of the pipeline and answers 202 with its job ID.
+    `on_mined` is called once the transaction is mined.
+    """
+    return accepted_job(receipt_poller.track(pending, on_mined=on_mined))
+
+def accepted_job(job):
+    return make_response(jsonify({"message": messages.ACCEPTED, "jobId": job.id}), 202, {"Location": f"/jobs/{job.id}"})
 
 def was_cfp_created(cfp):
         return cfp == empty
@@ -452,17 +1004,6 @@ def was_cfp_created(cfp):
 def is_valid_mimetype(mimetype):
     return mimetype == "application/json"
 
-def is_valid_address(address):
-    return re.match(r"^0x[a-fA-F0-9]{40}$", address)
-
-def is_valid_call_id(call_id):
-    # If it's not a string or doesn't start with 0x, it's not a valid hash
-    if not isinstance(call_id, str) or not call_id.startswith("0x"):
-        return False
-    
-    # If it doesn't match the regex (alphanumeric and 64 characters), it's not a valid hash
-    return re.match(r'^0x[0-9a-fA-F]{64}$', call_id)
-
 @app.get('/resolve/<name>')
 def resolve(name):
     """
@@ -509,11 +1050,17 @@ def register_name():
         name_hash = w3.keccak(text=name)
         
         # Ensure owner address is in checksum format
-        owner_checksum = w3.to_checksum_address(owner)
+        owner_checksum = checksum(owner)
         
         # Call the register function of the UserFIFSRegistrar contract
         tx = user_fifs_registrar_contract.functions.register(name_hash, owner_checksum).transact({"from": owner_checksum})
-        w3.eth.waitForTransactionReceipt(tx)
+        job = receipt_poller.track(tx_hash=tx)
+        if respond_async():
+            return accepted_job(job)
+        
+        # The receipt poller notifies us when the transaction is mined
+        if not job.wait(TX_SEND_TIMEOUT) or job.status != "mined":
+            return make_response(jsonify({"message": job.reason or messages.INTERNAL_ERROR}), 500)
         
         return make_response(jsonify({"message": messages.OK}), 201)
     except Exception as e:
@@ -522,22 +1069,47 @@ def register_name():
 def is_valid_mnemonic(mnemonic):
     return len(mnemonic.split()) == 12  
     
-if __name__ == '__main__':
-  
-  with open(args.mnemonic) as f:
-    mnemonic = f.read()
-    
-  try :
+def load_owner(mnemonic_path, nonce_file=None):
+    """
+    Derives the owner account from the mnemonic and creates the pipeline that sends its transactions.
+    With `nonce_file` the nonce is shared through that file with other processes of the server.
+    """
+    global owner, tx_pipeline
+    with open(mnemonic_path) as f:
+        mnemonic = f.read()
     if not is_valid_mnemonic(mnemonic):
-      raise Exception("La semilla no es válida")
+        raise Exception("La semilla no es válida")
     Account.enable_unaudited_hdwallet_features()
 
     owner = Account.from_mnemonic(mnemonic, account_path="m/44'/60'/0'/0/0")
     print("Owner address: ", owner.address)
 
+    # Transactions of the owner are signed here and sent by a single thread that keeps its nonce
+    nonces = SharedNonceManager(w3, owner.address, nonce_file) if nonce_file else None
+    tx_pipeline = TransactionPipeline(w3, owner, nonces=nonces)
+    registry.callback("cfp_transactions_in_flight", "Owner transactions queued or sent but not mined.", "gauge", (),
+                      lambda: [((), tx_pipeline.in_flight())])
+
+def start_services():
+    """Starts the background workers of the process that serves requests."""
+    # Forks the recovery workers, so it goes before any thread is started
+    signature_recovery.start()
+    tx_pipeline.start()
+    head_tracker.start()
+    receipt_poller.start()
+    if not args.no_index:
+        indexer.start()
+
+if __name__ == '__main__':
+  try :
+    load_owner(args.mnemonic)
+
+    # With debug=True the reloader also runs this block in its parent process, which does not serve requests
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+      start_services()
+
     app.run(debug = True)
     
     
   except Exception as error:
     print("Se ha producido un error", error)
-  
\ No newline at end of file
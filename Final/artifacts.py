@@ -0,0 +1,134 @@
+"""Loading of truffle artifacts, keeping only their ABI and deployed addresses."""
+import hashlib
+import json
+import marshal
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Folder, next to the artifacts, where their compact form is kept
+CACHE_DIR = "__abicache__"
+# Bumped whenever the layout of the cached entries changes
+CACHE_VERSION = 1
+
+
+def digest(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def parse(path):
+    """
+    Reads the `abi` and the address of each network of an artifact. With ijson the
+    file is streamed, so bytecode, AST and source maps are never built in memory.
+    """
+    if ijson is None:
+        with open(path) as f:
+            artifact = json.load(f)
+        abi, networks = artifact["abi"], artifact.get("networks", {}).items()
+        return {"abi": abi, "networks": {network: data.get("address") for network, data in networks}}
+    with open(path, "rb") as f:
+        abi = next(ijson.items(f, "abi", use_float=True))
+        f.seek(0)
+        networks = {network: data.get("address") for network, data in ijson.kvitems(f, "networks", use_float=True)}
+    return {"abi": abi, "networks": networks}
+
+
+def cache_path(path):
+    directory, name = os.path.split(path)
+    return os.path.join(directory, CACHE_DIR, name + ".marshal")
+
+
+def load(path):
+    """
+    Returns the {"abi", "networks"} of an artifact. The result is cached with marshal
+    and reused while the artifact keeps its mtime and size, or, if those changed, its
+    SHA-256 (e.g. after a redeploy that rewrote identical files).
+    """
+    stat = os.stat(path)
+    cached = cache_path(path)
+    entry = None
+    try:
+        with open(cached, "rb") as f:
+            entry = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    if entry and entry[0] == CACHE_VERSION and entry[1:3] == (stat.st_mtime_ns, stat.st_size):
+        return entry[4]
+    sha = digest(path)
+    data = entry[4] if entry and entry[0] == CACHE_VERSION and entry[3] == sha else parse(path)
+    try:
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        with open(cached + ".tmp", "wb") as f:
+            marshal.dump((CACHE_VERSION, stat.st_mtime_ns, stat.st_size, sha, data), f)
+        os.replace(cached + ".tmp", cached)
+    except OSError:
+        pass
+    return data
+
+
+class Artifact:
+    """ABI and address of a contract in `network`, read on first use."""
+
+    def __init__(self, path, network=None):
+        self.path = path
+        self.network = network
+        self._data = None
+        self._lock = threading.Lock()
+
+    @property
+    def data(self):
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    self._data = load(self.path)
+        return self._data
+
+    def loaded(self):
+        return self._data is not None
+
+    @property
+    def abi(self):
+        return self.data["abi"]
+
+    @property
+    def address(self):
+        return self.data["networks"][self.network]
+
+    def deployed(self):
+        """Whether the artifact has an address in its network."""
+        return os.path.exists(self.path) and self.data["networks"].get(self.network) is not None
+
+    def contract(self, w3):
+        return LazyContract(w3, self)
+
+
+class LazyContract:
+    """Stands in for the web3 contract object of an artifact and builds it on first use."""
+
+    def __init__(self, w3, artifact):
+        self._w3 = w3
+        self._artifact = artifact
+        self._contract = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if self._contract is None:
+            with self._lock:
+                if self._contract is None:
+                    self._contract = self._w3.eth.contract(address=self._artifact.address, abi=self._artifact.abi)
+        return getattr(self._contract, name)
+
+
+def preload(artifacts):
+    """Loads several artifacts at once; hashing and reading release the GIL, so they overlap."""
+    with ThreadPoolExecutor(len(artifacts) or 1) as pool:
+        list(pool.map(lambda artifact: artifact.data, artifacts))
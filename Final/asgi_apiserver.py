@@ -0,0 +1,265 @@
+"""
+Asynchronous entry point of the CFP API.
+
+Read endpoints that query the node are served by a Quart application with AsyncWeb3,
+so concurrent requests share a small pool of aiohttp connections instead of holding a
+thread each while they wait for the node. Every other route (writes, `/calls`, stats)
+is dispatched to the Flask application of apiserver.py, which runs in worker threads,
+so both entry points answer with the same routes and `messages`.
+"""
+import asyncio
+
+import aiohttp
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+from hypercorn.middleware import AsyncioWSGIMiddleware
+from quart import Quart, Response, jsonify, request
+from web3 import AsyncHTTPProvider, AsyncWeb3, Web3
+from werkzeug.exceptions import HTTPException
+
+import options
+
+
+@options.entry_point
+def add_arguments(parser):
+    parser.add_argument('--host', help = "Address where the server listens", default="127.0.0.1")
+    parser.add_argument('--port', help = "Port where the server listens", type=int, default=5000)
+    parser.add_argument('--connections', help = "Connections to the node shared by the asynchronous handlers", type=int, default=8)
+
+
+# apiserver parses the command line on import, with the arguments registered above
+import apiserver
+import messages
+from apiserver import args, authorization_cache, cfp_address, cfp_cache, data_version, empty, index_ready, indexer, list_responses
+from cache import LRUCache
+from serializer import hex_many
+from timefmt import isoformat
+from validation import checksum, is_valid_address, is_valid_call_id
+
+app = Quart(__name__)
+aw3 = AsyncWeb3(AsyncHTTPProvider(apiserver.node_uri))
+cfp_factory_contract = aw3.eth.contract(address=cfp_address, abi=apiserver.cfp_factory_artifact.abi)
+public_resolver_contract = aw3.eth.contract(address=apiserver.public_resolver_artifact.address,
+                                            abi=apiserver.public_resolver_artifact.abi)
+cfp_contracts = LRUCache(apiserver.args.cache_size)
+
+# Routes not defined here are answered by the Flask application
+wsgi_app = AsyncioWSGIMiddleware(apiserver.app)
+
+
+@app.before_serving
+async def open_session():
+    connector = aiohttp.TCPConnector(limit=args.connections)
+    await aw3.provider.cache_async_session(aiohttp.ClientSession(connector=connector))
+
+
+@app.after_request
+async def allow_origin(response):
+    # Same header flask_cors adds to the routes of the Flask application
+    response.headers.setdefault("Access-Control-Allow-Origin", "*")
+    return response
+
+
+def cfp_contract(address):
+    contract = cfp_contracts.get(address)
+    if contract is None:
+        contract = aw3.eth.contract(address=address, abi=apiserver.cfp_artifact.abi)
+        cfp_contracts.put(address, contract)
+    return contract
+
+
+async def list_response(version, build):
+    """
+    Counterpart of `ResponseCache.respond` for the asynchronous handlers: `build` is a
+    coroutine function. Shares the bodies and ETags cached by the Flask routes.
+    """
+    key = request.full_path
+    version, cached = list_responses.lookup(key, version)
+    body, etag = cached if cached is not None else list_responses.store(key, version, await build())
+    if request.if_none_match.contains(etag):
+        response = Response("", status=304)
+    else:
+        response = Response(body, 200, mimetype="application/json")
+    response.set_etag(etag)
+    return response
+
+
+async def call_record(call_id):
+    """Asynchronous counterpart of `CFPCache.call`, sharing its cached records."""
+    cfp = cfp_cache.cached_call(call_id)
+    if cfp is None:
+        cfp = await cfp_factory_contract.functions.calls(call_id).call()
+        cfp_cache.record_call(call_id, cfp)
+    return cfp
+
+
+@app.get('/authorized/<address>')
+async def authorized(address):
+    if not is_valid_address(address):
+        return jsonify({"message": messages.INVALID_ADDRESS}), 400
+
+    address = checksum(address)
+    if authorization_cache.known_unauthorized(address):
+        return jsonify({"authorized": False}), 200
+    is_authorized = await cfp_factory_contract.functions.isAuthorized(address).call()
+    authorization_cache.record(address, is_authorized)
+    return jsonify({"authorized": is_authorized}), 200
+
+
+@app.get('/registered/<address>')
+async def registered(address):
+    if not is_valid_address(address):
+        return jsonify({"message": messages.INVALID_ADDRESS}), 400
+
+    try:
+        is_registered = await cfp_factory_contract.functions.isRegistered(checksum(address)).call()
+        return jsonify({"registered": is_registered}), 200
+    except Exception as e:
+        return jsonify({"message": str(e)}), 500
+
+
+@app.get('/calls/<call_id>')
+async def get_call(call_id):
+    if not is_valid_call_id(call_id):
+        return jsonify({"message": messages.INVALID_CALLID}), 400
+
+    indexed = indexer.get_call(call_id) if index_ready() else None
+    if indexed:
+        return jsonify({"creator": indexed["creator"], "cfp": indexed["cfp"]}), 200
+
+    cfp = await call_record(call_id)
+    if cfp[0] == empty:
+        return jsonify({"message": messages.CALLID_NOT_FOUND}), 404
+    return jsonify({"creator": cfp[0], "cfp": cfp[1]}), 200
+
+
+@app.get('/closing-time/<call_id>')
+async def closing_time(call_id):
+    if not is_valid_call_id(call_id):
+        return jsonify({"message": messages.INVALID_CALLID}), 400
+
+    indexed = indexer.get_call(call_id) if index_ready() else None
+    if indexed:
+        closing_time = indexed["closingTime"]
+    else:
+        cfp = await call_record(call_id)
+        if cfp[0] == empty:
+            return jsonify({"message": messages.CALLID_NOT_FOUND}), 404
+        closing_time = await cfp_contract(cfp[1]).functions.closingTime().call()
+    return jsonify({"closingTime": isoformat(closing_time)}), 200
+
+
+@app.get('/proposal-data/<call_id>/<proposal>')
+async def proposal_data(call_id, proposal):
+    if not is_valid_call_id(call_id):
+        return jsonify({"message": messages.INVALID_CALLID}), 400
+
+    indexed = indexer.get_call(call_id) if index_ready() else None
+    if indexed:
+        address = indexed["cfp"]
+    else:
+        cfp = await call_record(call_id)
+        if cfp[0] == empty:
+            return jsonify({"message": messages.CALLID_NOT_FOUND}), 404
+        address = cfp[1]
+
+    if not is_valid_call_id(proposal):
+        return jsonify({"message": messages.INVALID_PROPOSAL}), 400
+
+    indexed_proposal = indexer.get_proposal(address, proposal) if indexed else None
+    if indexed_proposal:
+        data = (indexed_proposal["sender"], indexed_proposal["blockNumber"], indexed_proposal["timestamp"])
+    else:
+        data = await cfp_contract(address).functions.proposalData(proposal).call()
+
+    if data[0] == empty:
+        return jsonify({"message": messages.PROPOSAL_NOT_FOUND}), 404
+
+    return jsonify({"timestamp": isoformat(data[2]), "sender": str(data[0]), "blockNumber": data[1]}), 200
+
+
+@app.get('/creators')
+async def creators():
+    try:
+        async def build():
+            return {"creators": list(await cfp_factory_contract.functions.getCreatorsList().call())}
+        return await list_response(data_version(False), build)
+    except Exception as e:
+        return jsonify({"message": str(e)}), 500
+
+
+@app.get('/createdBy/<address>')
+async def created_by(address):
+    if not is_valid_address(address):
+        return jsonify({"message": messages.INVALID_ADDRESS}), 400
+
+    try:
+        if index_ready():
+            async def build():
+                return {"calls": indexer.calls_by(checksum(address))}
+            return await list_response(data_version(True), build)
+        async def build():
+            return {"calls": hex_many(await cfp_factory_contract.functions.callsByCreator(address).call())}
+        return await list_response(data_version(False), build)
+    except Exception as e:
+        return jsonify({"message": str(e)}), 500
+
+
+@app.get('/pending')
+async def pending():
+    try:
+        async def build():
+            return {"pending": await cfp_factory_contract.functions.getAllPending().call({"from": apiserver.owner.address})}
+        return await list_response(data_version(False), build)
+    except Exception as e:
+        return jsonify({"message": str(e)}), 500
+
+
+@app.get('/resolve/<name>')
+async def resolve(name):
+    try:
+        resolved_address = await public_resolver_contract.functions.addr(Web3.keccak(text=name)).call()
+        if resolved_address == empty:
+            return jsonify({"message": messages.NAME_NOT_FOUND}), 404
+        return jsonify({"address": resolved_address}), 200
+    except Exception as e:
+        return jsonify({"message": str(e)}), 500
+
+
+@app.get('/contract-address')
+async def contract_address():
+    return jsonify({"address": cfp_address}), 200
+
+
+@app.get('/contract-owner')
+async def contract_owner():
+    return jsonify({"address": apiserver.owner.address}), 200
+
+
+def handled_here(scope):
+    """Whether the Quart application has a route for the method and path of an HTTP request."""
+    try:
+        app.url_map.bind("").match(scope["path"], scope["method"])
+    except HTTPException:
+        return False
+    return True
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "http" and not handled_here(scope):
+        await wsgi_app(scope, receive, send)
+    else:
+        await app(scope, receive, send)
+
+
+if __name__ == '__main__':
+    try:
+        apiserver.load_owner(apiserver.args.mnemonic)
+        apiserver.start_services()
+
+        config = Config()
+        config.bind = [f"{args.host}:{args.port}"]
+        asyncio.run(serve(application, config))
+
+    except Exception as error:
+        print("Se ha producido un error", error)
@@ -0,0 +1,202 @@
+"""
+Load test of the API server: drives a concurrent mix of reads and writes against a
+server running on a local Ganache and reports, per endpoint, the throughput and the
+p50/p95/p99 latencies as JSON, so runs can be compared with each other.
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from eth_account import Account
+
+import test_apiserver
+from test_apiserver import (get_closing_time, get_contract_address, post_create, post_register,
+                            post_register_proposal, random_address, random_hash, sign, url)
+
+DEFAULT_MIX = "authorized=4,call=4,closing-time=2,proposal-data=4,calls=1,create=1,register=1,register-proposal=2"
+
+
+class Workload:
+    """Accounts and calls created before the run, which the operations read from and write to."""
+
+    def __init__(self, accounts, calls):
+        self.contract_address = get_contract_address()
+        self.accounts = []
+        self.calls = []
+        self.proposals = []
+        self.lock = threading.Lock()
+        for _ in range(accounts):
+            account = Account.create()
+            response = post_register(account.address, sign(self.contract_address, account))
+            response.raise_for_status()
+            self.accounts.append(account)
+        for _ in range(calls):
+            call_id = random_hash()
+            post_create(random.choice(self.accounts), call_id, get_closing_time()).raise_for_status()
+            proposal = random_hash()
+            post_register_proposal(call_id, proposal).raise_for_status()
+            self.calls.append(call_id)
+            self.proposals.append((call_id, proposal))
+
+    def authorized(self):
+        return requests.get(url("authorized", random.choice([random.choice(self.accounts).address, random_address()])), timeout=10)
+
+    def call(self):
+        return requests.get(url("calls", random.choice(self.calls)), timeout=10)
+
+    def closing_time(self):
+        return requests.get(url("closing-time", random.choice(self.calls)), timeout=10)
+
+    def proposal_data(self):
+        call_id, proposal = random.choice(self.proposals)
+        return requests.get(url("proposal-data", f"{call_id}/{proposal}"), timeout=10)
+
+    def calls_list(self):
+        return requests.get(url("calls"), timeout=10)
+
+    def create(self):
+        call_id = random_hash()
+        response = post_create(random.choice(self.accounts), call_id, get_closing_time())
+        if response.status_code == 201:
+            with self.lock:
+                self.calls.append(call_id)
+        return response
+
+    def register(self):
+        account = Account.create()
+        return post_register(account.address, sign(self.contract_address, account))
+
+    def register_proposal(self):
+        call_id = random.choice(self.calls)
+        proposal = random_hash()
+        response = post_register_proposal(call_id, proposal)
+        if response.status_code == 201:
+            with self.lock:
+                self.proposals.append((call_id, proposal))
+        return response
+
+    def operations(self):
+        return {
+            "authorized": self.authorized,
+            "call": self.call,
+            "closing-time": self.closing_time,
+            "proposal-data": self.proposal_data,
+            "calls": self.calls_list,
+            "create": self.create,
+            "register": self.register,
+            "register-proposal": self.register_proposal,
+        }
+
+
+def parse_mix(mix):
+    """Parses "name=weight,..." into a dict of weights."""
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list."""
+    index = max(0, min(len(values) - 1, math.ceil(fraction * len(values)) - 1))
+    return values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    result = {}
+    for name, values in sorted(latencies.items()):
+        values.sort()
+        result[name] = {
+            "requests": len(values),
+            "errors": errors[name],
+            "throughput": round(len(values) / elapsed, 2),
+            "mean": round(sum(values) / len(values) * 1000, 2),
+            "p50": round(percentile(values, 0.50) * 1000, 2),
+            "p95": round(percentile(values, 0.95) * 1000, 2),
+            "p99": round(percentile(values, 0.99) * 1000, 2),
+        }
+    return result
+
+
+def run(workload, weights, concurrency, duration, total):
+    """Runs operations picked by weight from `concurrency` threads, for `duration` seconds or `total` requests."""
+    operations = workload.operations()
+    unknown = set(weights) - set(operations)
+    if unknown:
+        raise ValueError(f"Unknown operations: {', '.join(sorted(unknown))}")
+    names = list(weights)
+    lock = threading.Lock()
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    counter = iter(range(total)) if total else None
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        while time.perf_counter() < deadline:
+            if counter is not None:
+                with lock:
+                    if next(counter, None) is None:
+                        return
+            name = random.choices(names, [weights[n] for n in names])[0]
+            start = time.perf_counter()
+            try:
+                failed = operations[name]().status_code >= 500
+            except requests.RequestException:
+                failed = True
+            latency = time.perf_counter() - start
+            with lock:
+                latencies[name].append(latency)
+                errors[name] += failed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - start
+
+    report = summarize(latencies, errors, elapsed)
+    all_latencies = [latency for values in latencies.values() for latency in values]
+    report["total"] = summarize({"total": all_latencies}, {"total": sum(errors.values())}, elapsed)["total"]
+    return elapsed, report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--server', help="URL of the API server", default=test_apiserver.SERVER)
+    parser.add_argument('--concurrency', help="Concurrent clients", type=int, default=16)
+    parser.add_argument('--duration', help="Seconds the run lasts", type=float, default=30)
+    parser.add_argument('--requests', help="Stop after this many requests (0 for no limit)", type=int, default=0)
+    parser.add_argument('--mix', help="Weights of each operation, as name=weight,...", default=DEFAULT_MIX)
+    parser.add_argument('--accounts', help="Authorized accounts created before the run", type=int, default=5)
+    parser.add_argument('--calls', help="Calls (each with a proposal) created before the run", type=int, default=10)
+    parser.add_argument('--label', help="Name of the run, stored in the report", default="")
+    parser.add_argument('--output', help="File where the JSON report is written (stdout if empty)", default="")
+    args = parser.parse_args()
+
+    # The helpers of test_apiserver build their URLs from this module variable
+    test_apiserver.SERVER = args.server.rstrip("/")
+    workload = Workload(args.accounts, args.calls)
+    elapsed, endpoints = run(workload, parse_mix(args.mix), args.concurrency, args.duration, args.requests)
+
+    report = {
+        "label": args.label,
+        "server": test_apiserver.SERVER,
+        "concurrency": args.concurrency,
+        "mix": args.mix,
+        "elapsed": round(elapsed, 3),
+        "latencyUnit": "ms",
+        "endpoints": endpoints,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
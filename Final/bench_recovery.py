@@ -0,0 +1,46 @@
+"""Compares the throughput of signer recovery on the request thread against the process pool."""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from os import urandom
+
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+from signatures import SignatureRecovery, recover
+
+
+def signed_messages(count):
+    """Generates `count` random 20 byte messages, like the one signed for /register, with their signatures."""
+    account = Account.create()
+    items = []
+    for _ in range(count):
+        message = urandom(20)
+        items.append((message, account.sign_message(encode_defunct(message)).signature.hex()))
+    return items
+
+
+def measure(name, count, function):
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<40} {count / elapsed:>10.1f} recoveries/s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', help="Signatures to recover", type=int, default=2000)
+    parser.add_argument('--threads', help="Concurrent request handlers", type=int, default=8)
+    parser.add_argument('--workers', help="Processes in the recovery pool", type=int, default=None)
+    args = parser.parse_args()
+
+    items = signed_messages(args.count)
+    pool = SignatureRecovery(args.workers)
+    pool.start()
+
+    with ThreadPoolExecutor(args.threads) as handlers:
+        measure("request thread (current path)", args.count,
+                lambda: list(handlers.map(lambda item: recover(*item), items)))
+        measure("process pool, one per request", args.count,
+                lambda: list(handlers.map(lambda item: pool.recover(*item), items)))
+    measure("process pool, /register/batch", args.count, lambda: pool.recover_many(items))
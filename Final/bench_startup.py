@@ -0,0 +1,82 @@
+"""Measures the time-to-first-request of the API server, and the artifact loading part of it."""
+import argparse
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+import requests
+
+import artifacts
+
+ARTIFACTS = ("CFPFactory.json", "PublicResolver.json", "UserFIFSRegistrar.json", "CFP.json")
+
+
+def clear_cache(contracts_dir):
+    shutil.rmtree(os.path.join(contracts_dir, artifacts.CACHE_DIR), ignore_errors=True)
+
+
+def measure_loading(contracts_dir, runs):
+    """Compares full json.load of the artifacts with the loader, cold and warm."""
+    paths = [os.path.join(contracts_dir, name) for name in ARTIFACTS]
+
+    def timed(function):
+        start = time.perf_counter()
+        for path in paths:
+            function(path)
+        return time.perf_counter() - start
+
+    def full(path):
+        with open(path) as f:
+            json.load(f)
+
+    results = {"json.load": [], "cold": [], "warm": []}
+    for _ in range(runs):
+        results["json.load"].append(timed(full))
+        clear_cache(contracts_dir)
+        results["cold"].append(timed(artifacts.load))
+        results["warm"].append(timed(artifacts.load))
+    return {name: round(min(times) * 1000, 2) for name, times in results.items()}
+
+
+def time_to_first_request(server_args, port, cold, contracts_dir):
+    """Starts apiserver.py and returns the seconds until /contract-address answers."""
+    if cold:
+        clear_cache(contracts_dir)
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "apiserver.py", *server_args],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        while True:
+            try:
+                if requests.get(f"http://127.0.0.1:{port}/contract-address", timeout=1).ok:
+                    return time.perf_counter() - start
+            except requests.ConnectionError:
+                pass
+            if process.poll() is not None:
+                raise RuntimeError("apiserver.py exited before answering")
+            time.sleep(0.02)
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--build', help="Route to the folder that contains build folder", default=".")
+    parser.add_argument('--runs', help="Repetitions of each measurement", type=int, default=5)
+    parser.add_argument('--port', help="Port where apiserver.py listens", type=int, default=5000)
+    parser.add_argument('--server', help="Also start apiserver.py (needs Ganache) to time the first request", action="store_true")
+    args, server_args = parser.parse_known_args()
+    contracts_dir = os.path.join(args.build, "build", "contracts")
+
+    report = {"artifactsMs": measure_loading(contracts_dir, args.runs)}
+    if args.server:
+        server_args = ["--build", args.build, *server_args]
+        for cold in (True, False):
+            times = [time_to_first_request(server_args, args.port, cold, contracts_dir) for _ in range(args.runs)]
+            report["firstRequestSeconds" + ("Cold" if cold else "Warm")] = round(min(times), 3)
+    print(json.dumps(report, indent=2))
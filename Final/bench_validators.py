@@ -0,0 +1,52 @@
+"""Compares the input checks of one /register request before and after the validation module."""
+import argparse
+import re
+import timeit
+from os import urandom
+
+from eth_utils import to_checksum_address
+
+import validation
+
+
+def old_is_valid_address(address):
+    return re.match(r"^0x[a-fA-F0-9]{40}$", address)
+
+
+def old_is_valid_call_id(call_id):
+    if not isinstance(call_id, str) or not call_id.startswith("0x"):
+        return False
+    return re.match(r'^0x[0-9a-fA-F]{64}$', call_id)
+
+
+def old_is_valid_signature(signature):
+    return all(c in "0123456789abcdefABCDEF" for c in signature[2:]) and len(signature[2:]) == 130
+
+
+def old_request(address, call_id, signature):
+    """Checks done by /register and /create, with the three checksums of /register."""
+    old_is_valid_address(address)
+    old_is_valid_call_id(call_id)
+    old_is_valid_signature(signature)
+    for _ in range(3):
+        to_checksum_address(address.lower())
+
+
+def new_request(address, call_id, signature):
+    validation.is_valid_address(address)
+    validation.is_valid_call_id(call_id)
+    validation.is_valid_signature(signature)
+    for _ in range(3):
+        validation.checksum(address)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', help="Requests timed in each repetition", type=int, default=20000)
+    parser.add_argument('--accounts', help="Distinct addresses cycled through", type=int, default=100)
+    args = parser.parse_args()
+
+    inputs = [("0x" + urandom(20).hex(), "0x" + urandom(32).hex(), "0x" + urandom(65).hex()) for _ in range(args.accounts)]
+    for name, function in (("before", old_request), ("after", new_request)):
+        seconds = min(timeit.repeat(lambda: [function(*item) for item in inputs], number=args.number // args.accounts, repeat=5))
+        print(f"{name:<8} {seconds / args.number * 1e6:8.2f} µs/request")
@@ -0,0 +1,173 @@
+"""In-process caches used by the API server."""
+import threading
+import time
+from collections import OrderedDict
+
+EMPTY_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry and counts hits and misses."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None, count_miss=True):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += count_miss
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            return self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Returns the size, capacity and hit/miss counters of the cache."""
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class TTLCache(LRUCache):
+    """LRUCache whose entries also expire `ttl` seconds after being stored."""
+
+    def __init__(self, maxsize=1024, ttl=60.0):
+        super().__init__(maxsize)
+        self.ttl = ttl
+
+    def get(self, key, default=None, count_miss=True):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += count_miss
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        super().put(key, (time.monotonic() + self.ttl, value))
+
+
+class AuthorizationCache:
+    """
+    Short-lived cache of negative `isAuthorized` results of CFPFactory, so retried
+    requests from unauthorized accounts do not reach the node every time.
+    Entries must be forgotten once a transaction of the server that authorizes or
+    unauthorizes an account is mined.
+    """
+
+    def __init__(self, factory_contract, maxsize=1024, ttl=2.0):
+        self.factory_contract = factory_contract
+        self.unauthorized = TTLCache(maxsize, ttl)
+
+    def is_authorized(self, address):
+        if self.known_unauthorized(address):
+            return False
+        authorized = self.factory_contract.functions.isAuthorized(address).call()
+        self.record(address, authorized)
+        return authorized
+
+    def known_unauthorized(self, address):
+        return self.unauthorized.get(address, False)
+
+    def record(self, address, authorized):
+        """Stores an `isAuthorized` result obtained elsewhere, e.g. in an RPC batch."""
+        if not authorized:
+            self.unauthorized.put(address, True)
+
+    def forget(self, address):
+        self.unauthorized.pop(address)
+
+    def stats(self):
+        return self.unauthorized.stats()
+
+
+class CFPCache:
+    """
+    Loads the CFP ABI from its Artifact once and caches CFP contract objects by address,
+    along with the callId -> call record mapping of CFPFactory.
+
+    Existing calls are cached for good, since a call cannot change once created.
+    Missing ones are only remembered for `missing_ttl` seconds, because they may be
+    created at any moment; the server forgets them once a call it created is mined.
+    A lookup found in neither cache counts as a single miss, of `calls`.
+    """
+
+    def __init__(self, w3, artifact, maxsize=256, missing_ttl=2.0):
+        self.artifact = artifact
+        self.w3 = w3
+        self.contracts = LRUCache(maxsize)
+        self.calls = LRUCache(maxsize)
+        self.missing = TTLCache(maxsize, missing_ttl)
+
+    def contract(self, address):
+        """Returns the CFP contract object deployed at `address`."""
+        contract = self.contracts.get(address)
+        if contract is None:
+            contract = self.w3.eth.contract(address=address, abi=self.artifact.abi)
+            self.contracts.put(address, contract)
+        return contract
+
+    def call(self, factory_contract, call_id):
+        """Returns the (creator, cfp, callId, timestamp) record of `call_id` in the factory."""
+        cfp = self.cached_call(call_id)
+        if cfp is None:
+            cfp = factory_contract.functions.calls(call_id).call()
+            self.record_call(call_id, cfp)
+        return cfp
+
+    def cached_call(self, call_id):
+        """Returns the cached record of `call_id`, or None if it has to be read from the factory."""
+        key = call_id.lower()
+        cfp = self.calls.get(key)
+        if cfp is None:
+            cfp = self.missing.get(key, count_miss=False)
+        return cfp
+
+    def record_call(self, call_id, cfp):
+        """Stores a call record obtained elsewhere, e.g. in an RPC batch."""
+        if cfp[0] != EMPTY_ADDRESS:
+            self.calls.put(call_id.lower(), cfp)
+        else:
+            self.missing.put(call_id.lower(), cfp)
+
+    def forget_missing(self, call_id):
+        self.missing.pop(call_id.lower())
+
+    def clear(self):
+        self.contracts.clear()
+        self.calls.clear()
+        self.missing.clear()
+
+    def stats(self):
+        return {"contracts": self.contracts.stats(), "calls": self.calls.stats(), "missingCalls": self.missing.stats()}
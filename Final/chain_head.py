@@ -0,0 +1,91 @@
+"""Shared view of the head of the chain, followed by a single polling thread."""
+import threading
+import time
+
+# Polls that must fail in a row before the head is reported as stale
+STALE_POLLS = 4
+
+
+class HeadTracker:
+    """
+    Polls the node for its latest block header every `interval` seconds and keeps
+    the number, hash, timestamp and base fee of the head in memory, so request
+    handlers can read them without a round-trip. Callables registered with
+    `subscribe` are run with the new header whenever the head changes.
+    """
+
+    def __init__(self, w3, interval=0.5):
+        self.w3 = w3
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.head = None
+        self.updated = None
+        self.listeners = []
+        self.polls = 0
+        self.errors = 0
+        self.heads = 0
+
+    def start(self):
+        self.poll()
+        threading.Thread(target=self.run, name="head-tracker", daemon=True).start()
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.poll()
+            except Exception as e:
+                self.errors += 1
+                print("Error while polling the chain head:", e)
+
+    def poll(self):
+        block = self.w3.eth.get_block("latest")
+        self.polls += 1
+        header = {
+            "number": block.number,
+            "hash": block.hash,
+            "timestamp": block.timestamp,
+            "baseFeePerGas": block.get("baseFeePerGas"),
+        }
+        with self.lock:
+            changed = self.head is None or self.head["hash"] != header["hash"]
+            self.head = header
+            self.updated = time.monotonic()
+        if changed:
+            self.heads += 1
+            for listener in self.listeners:
+                listener(header)
+
+    def latest(self):
+        """Returns the last known header, or None if there is none or it has not been refreshed lately."""
+        with self.lock:
+            if self.head is None or time.monotonic() - self.updated > STALE_POLLS * self.interval:
+                return None
+            return self.head
+
+    def stats(self):
+        """Returns the head and how far behind the node and the wall clock it may be."""
+        with self.lock:
+            head = self.head
+            updated = self.updated
+        if head is None:
+            return {"head": None, "polls": self.polls, "errors": self.errors}
+        return {
+            "head": {
+                "number": head["number"],
+                "hash": self.w3.to_hex(head["hash"]),
+                "timestamp": head["timestamp"],
+                "baseFeePerGas": head["baseFeePerGas"],
+            },
+            # Seconds since the head was last refreshed from the node
+            "refreshAge": round(time.monotonic() - updated, 3),
+            # Seconds between the timestamp of the head and the clock of the server
+            "headLag": round(time.time() - head["timestamp"], 3),
+            "heads": self.heads,
+            "polls": self.polls,
+            "errors": self.errors,
+            "stale": self.latest() is None,
+        }
@@ -0,0 +1,32 @@
+//SPDX-License-Identifier: MIT
+pragma solidity ^0.8.19;
+
+// Agrega varias llamadas de solo lectura en una única llamada, para consultar
+// muchos contratos con un solo `eth_call`
+contract Multicall {
+    struct Call {
+        address target;
+        bytes callData;
+    }
+
+    struct Result {
+        bool success;
+        bytes returnData;
+    }
+
+    // Ejecuta cada llamada con `staticcall` y devuelve sus resultados en el mismo orden.
+    // Si `requireSuccess` es verdadero, revierte cuando alguna de las llamadas falla.
+    function tryAggregate(bool requireSuccess, Call[] calldata calls) public view returns (Result[] memory results) {
+        results = new Result[](calls.length);
+        for (uint256 i = 0; i < calls.length; i++) {
+            (bool success, bytes memory returnData) = calls[i].target.staticcall(calls[i].callData);
+            require(success || !requireSuccess, "Multicall: la llamada ha fallado");
+            results[i] = Result(success, returnData);
+        }
+    }
+
+    // Devuelve el número del bloque sobre el que se ejecuta la consulta
+    function getBlockNumber() public view returns (uint256) {
+        return block.number;
+    }
+}
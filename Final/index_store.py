@@ -0,0 +1,112 @@
+"""On-disk snapshot of the CFP event index."""
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS calls (
+    position INTEGER PRIMARY KEY AUTOINCREMENT,
+    call_id TEXT UNIQUE,
+    creator TEXT,
+    cfp TEXT,
+    closing_time INTEGER,
+    block_number INTEGER
+);
+CREATE TABLE IF NOT EXISTS proposals (
+    cfp TEXT,
+    proposal TEXT,
+    sender TEXT,
+    block_number INTEGER,
+    timestamp INTEGER,
+    PRIMARY KEY (cfp, proposal)
+);
+"""
+
+
+class IndexStore:
+    """
+    SQLite snapshot of the indexed calls and proposals, with the number and
+    hash of the last indexed block as checkpoint.
+
+    The snapshot belongs to one CFPFactory deployment: if the factory address
+    differs from the stored one (e.g. after `truffle deploy --reset`) it is discarded.
+    """
+
+    def __init__(self, path, factory_address):
+        self.path = path
+        self.read_only = False
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.db:
+            self.db.executescript(SCHEMA)
+        if self.get_meta("factory") != factory_address:
+            self.clear()
+            self.set_meta("factory", factory_address)
+
+    def reopen(self, read_only=False):
+        """
+        Opens a new connection, as needed after a fork. A read-only store can still
+        restore a snapshot, but ignores saves, so only one process writes to the file.
+        """
+        self.db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self.read_only = read_only
+
+    def get_meta(self, key):
+        with self.lock:
+            row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def clear(self):
+        """Drops every indexed call and proposal along with the checkpoint."""
+        if self.read_only:
+            return
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM calls")
+            self.db.execute("DELETE FROM proposals")
+            self.db.execute("DELETE FROM meta WHERE key IN ('last_block', 'last_hash')")
+
+    def checkpoint(self):
+        """Returns the number and hash of the last indexed block, or (-1, None)."""
+        last_block = self.get_meta("last_block")
+        if last_block is None:
+            return -1, None
+        return int(last_block), bytes.fromhex(self.get_meta("last_hash"))
+
+    def load(self):
+        """Returns the stored calls, in creation order, and proposals."""
+        with self.lock:
+            calls = [{
+                "callId": call_id,
+                "creator": creator,
+                "cfp": cfp,
+                "closingTime": closing_time,
+                "blockNumber": block_number,
+            } for call_id, creator, cfp, closing_time, block_number in self.db.execute(
+                "SELECT call_id, creator, cfp, closing_time, block_number FROM calls ORDER BY position")]
+            proposals = [(cfp, proposal, {
+                "sender": sender,
+                "blockNumber": block_number,
+                "timestamp": timestamp,
+            }) for cfp, proposal, sender, block_number, timestamp in self.db.execute(
+                "SELECT cfp, proposal, sender, block_number, timestamp FROM proposals")]
+        return calls, proposals
+
+    def save(self, calls, proposals, last_block, last_hash):
+        """Appends newly indexed calls and proposals and moves the checkpoint, atomically."""
+        if self.read_only:
+            return
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO calls (call_id, creator, cfp, closing_time, block_number) VALUES (?, ?, ?, ?, ?)",
+                [(c["callId"], c["creator"], c["cfp"], c["closingTime"], c["blockNumber"]) for c in calls])
+            self.db.executemany(
+                "INSERT OR REPLACE INTO proposals VALUES (?, ?, ?, ?, ?)",
+                [(cfp, proposal, d["sender"], d["blockNumber"], d["timestamp"]) for cfp, proposal, d in proposals])
+            self.db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+                ("last_block", str(last_block)),
+                ("last_hash", bytes(last_hash).hex()),
+            ])
@@ -0,0 +1,211 @@
+"""Local index of CFPFactory and CFP state built from their events."""
+import threading
+from collections import OrderedDict
+
+from web3 import Web3
+
+CFP_CREATED = Web3.keccak(text="CFPCreated(address,bytes32,address)")
+PROPOSAL_REGISTERED = Web3.keccak(text="ProposalRegistered(bytes32,address,uint256)")
+
+# Number of recent block hashes kept to detect reorganizations
+HASH_HISTORY = 128
+
+
+class CFPIndexer:
+    """
+    Follows `CFPCreated` and `ProposalRegistered` events and keeps an in-memory
+    index of calls, their CFP contracts, closing times, creators and proposals.
+
+    Only blocks with at least `confirmations` blocks on top of them are indexed.
+    If the chain is reorganized below the last indexed block, or the node is
+    reset (its head goes back), the index is discarded and rebuilt from scratch.
+
+    If a `store` is given, indexed data is also written to it and restored on
+    start, so only the blocks after its checkpoint have to be replayed.
+    Listeners added with `subscribe_reset` are called after every rebuild.
+    """
+
+    def __init__(self, w3, factory_contract, cfp_cache, confirmations=0, interval=1.0, batch_size=1000, store=None):
+        self.w3 = w3
+        self.factory_contract = factory_contract
+        self.cfp_cache = cfp_cache
+        self.confirmations = confirmations
+        self.interval = interval
+        self.batch_size = batch_size
+        self.store = store
+        self.lock = threading.Lock()
+        self.ready = False
+        self.rebuilds = 0
+        # Changes whenever calls are added or the index is discarded, so cached lists can be validated
+        self.version = 0
+        self.reset_listeners = []
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.reset()
+
+    def reset(self):
+        """Discards everything indexed so far."""
+        with self.lock:
+            self.calls = {}
+            self.calls_list = []
+            self.created_by = {}
+            self.cfp_calls = {}
+            self.proposals = {}
+            self.last_block = -1
+            self.block_hashes = OrderedDict()
+            self.ready = False
+            self.version += 1
+
+    def restore(self):
+        """Loads the snapshot kept in the store, if any."""
+        last_block, last_hash = self.store.checkpoint()
+        if last_block < 0:
+            return
+        calls, proposals = self.store.load()
+        self.apply(calls, proposals, last_block, last_hash)
+        print(f"Restored {len(calls)} calls and {len(proposals)} proposals up to block {last_block}")
+
+    def start(self):
+        if self.store:
+            self.restore()
+        self._thread = threading.Thread(target=self.run, name="cfp-indexer", daemon=True)
+        self._thread.start()
+
+    def subscribe_reset(self, listener):
+        self.reset_listeners.append(listener)
+
+    def notify(self):
+        """Wakes up the indexer, e.g. after the server sent a transaction."""
+        self._wakeup.set()
+
+    def run(self):
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                print("Error while indexing events:", e)
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def sync(self):
+        """Indexes every confirmed block after the last indexed one."""
+        head = self.w3.eth.block_number
+        if self.reorganized(head):
+            print("Chain reorganization or reset detected, rebuilding the index")
+            self.reset()
+            self.cfp_cache.clear()
+            if self.store:
+                self.store.clear()
+            self.rebuilds += 1
+            for listener in self.reset_listeners:
+                listener()
+        target = head - self.confirmations
+        while self.last_block < target:
+            from_block = self.last_block + 1
+            to_block = min(target, from_block + self.batch_size - 1)
+            self.index_range(from_block, to_block)
+        self.ready = True
+
+    def reorganized(self, head):
+        """Returns whether the last indexed block is no longer part of the chain."""
+        if self.last_block < 0:
+            return False
+        if head < self.last_block:
+            return True
+        return self.w3.eth.get_block(self.last_block).hash != self.block_hashes[self.last_block]
+
+    def index_range(self, from_block, to_block):
+        logs = self.w3.eth.get_logs({
+            "fromBlock": from_block,
+            "toBlock": to_block,
+            "topics": [[Web3.to_hex(CFP_CREATED), Web3.to_hex(PROPOSAL_REGISTERED)]],
+        })
+        factory_address = self.factory_contract.address
+        new_calls = []
+        new_proposals = []
+        known_cfps = set(self.cfp_calls)
+        timestamps = {}
+        for log in logs:
+            topic = log["topics"][0]
+            if topic == CFP_CREATED and log["address"] == factory_address:
+                event = self.factory_contract.events.CFPCreated().process_log(log)
+                cfp_address = event["args"]["cfp"]
+                closing_time = self.cfp_cache.contract(cfp_address).functions.closingTime().call()
+                new_calls.append({
+                    "creator": event["args"]["creator"],
+                    "cfp": cfp_address,
+                    "callId": Web3.to_hex(event["args"]["callId"]),
+                    "closingTime": closing_time,
+                    "blockNumber": log["blockNumber"],
+                })
+                known_cfps.add(cfp_address)
+            elif topic == PROPOSAL_REGISTERED and log["address"] in known_cfps:
+                event = self.cfp_cache.contract(log["address"]).events.ProposalRegistered().process_log(log)
+                block_number = log["blockNumber"]
+                if block_number not in timestamps:
+                    timestamps[block_number] = self.w3.eth.get_block(block_number).timestamp
+                new_proposals.append((log["address"], Web3.to_hex(event["args"]["proposal"]), {
+                    "sender": event["args"]["sender"],
+                    "blockNumber": event["args"]["blockNumber"],
+                    "timestamp": timestamps[block_number],
+                }))
+        block_hash = self.w3.eth.get_block(to_block).hash
+        if self.store:
+            self.store.save(new_calls, new_proposals, to_block, block_hash)
+        self.apply(new_calls, new_proposals, to_block, block_hash)
+
+    def apply(self, new_calls, new_proposals, last_block, last_hash):
+        """Adds calls and proposals to the index and moves its checkpoint to `last_block`."""
+        with self.lock:
+            for call in new_calls:
+                self.calls[call["callId"]] = call
+                self.calls_list.append(call["callId"])
+                self.created_by.setdefault(call["creator"], []).append(call["callId"])
+                self.cfp_calls[call["cfp"]] = call["callId"]
+            if new_calls:
+                self.version += 1
+            for cfp_address, proposal, data in new_proposals:
+                self.proposals[(cfp_address, proposal)] = data
+            self.last_block = last_block
+            self.block_hashes[last_block] = last_hash
+            while len(self.block_hashes) > HASH_HISTORY:
+                self.block_hashes.popitem(last=False)
+
+    def get_call(self, call_id):
+        """Returns the indexed call with identifier `call_id`, or None."""
+        with self.lock:
+            return self.calls.get(call_id.lower())
+
+    def get_proposal(self, cfp_address, proposal):
+        """Returns the indexed data of `proposal` in the CFP at `cfp_address`, or None."""
+        with self.lock:
+            return self.proposals.get((cfp_address, proposal.lower()))
+
+    def all_calls(self):
+        """Returns every indexed call in creation order."""
+        with self.lock:
+            return [self.calls[call_id] for call_id in self.calls_list]
+
+    def calls_slice(self, start, stop):
+        """Returns the indexed calls with positions in [start, stop), in creation order."""
+        with self.lock:
+            return [self.calls[call_id] for call_id in self.calls_list[start:stop]]
+
+    def calls_by(self, creator):
+        """Returns the identifiers of the calls created by `creator`."""
+        with self.lock:
+            return list(self.created_by.get(creator, []))
+
+    def creators(self):
+        """Returns the addresses that have created at least one call."""
+        with self.lock:
+            return list(self.created_by)
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "lastBlock": self.last_block,
+            "calls": len(self.calls),
+            "proposals": len(self.proposals),
+            "rebuilds": self.rebuilds,
+        }
@@ -15,3 +15,9 @@ UNAUTHORIZED = "No autorizado"
 INTERNAL_ERROR = "Error interno"
 OK = "OK"
 NAME_NOT_FOUND = "Nombre no encontrado"
+INVALID_PAGINATION = "Parámetros de paginación inválidos"
+INVALID_TRANSACTION = "Identificador de transacción incorrecto"
+TRANSACTION_NOT_FOUND = "La transacción no existe"
+ACCEPTED = "Solicitud aceptada"
+JOB_NOT_FOUND = "La tarea no existe"
+INVALID_BATCH = "Lote inválido"
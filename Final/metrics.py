@@ -0,0 +1,225 @@
+"""Prometheus metrics of the API server, rendered in the text exposition format."""
+import bisect
+import math
+import threading
+import time
+
+import rlp
+from eth_utils import function_abi_to_4byte_selector
+
+# Upper bounds, in seconds, of the latency histograms
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Node methods whose first parameter is a transaction, labelled with the contract function they call
+CALL_METHODS = ("eth_call", "eth_estimateGas", "eth_sendTransaction")
+# Position of the data field in the RLP fields of a signed transaction, by type (0 is legacy)
+RAW_DATA_FIELD = {0: 5, 1: 6, 2: 7}
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def format_value(value):
+    return "+Inf" if value == math.inf else repr(value)
+
+
+class Histogram:
+    """Cumulative histogram per combination of label values."""
+
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        with self.lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self.series.items()]
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = format_labels(self.labels + ("le",), labels + (format_value(bound),))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, labels)} {total}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter per combination of label values."""
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self):
+        with self.lock:
+            series = sorted(self.series.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{format_labels(self.labels, labels)} {value}" for labels, value in series)
+        return lines
+
+
+class Callback:
+    """Metric whose samples are read when it is scraped, from a function returning (labels, value) pairs."""
+
+    def __init__(self, name, help, kind, labels, collect):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labels = labels
+        self.collect = collect
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            samples = list(self.collect())
+        except Exception:
+            samples = []
+        lines.extend(f"{self.name}{format_labels(self.labels, labels)} {value}"
+                     for labels, value in samples if value is not None)
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def callback(self, name, help, kind="gauge", labels=(), collect=lambda: ()):
+        return self.register(Callback(name, help, kind, labels, collect))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def raw_transaction_data(raw):
+    """Returns the data field (hex) of a signed transaction, as sent to `eth_sendRawTransaction`."""
+    raw = bytes.fromhex(raw[2:]) if isinstance(raw, str) else bytes(raw)
+    # Typed transactions (EIP-2718) start with their type, below 0x7f; legacy ones with an RLP list
+    kind = raw[0] if raw[0] < 0x7f else 0
+    fields = rlp.decode(raw[1:] if kind else raw)
+    return "0x" + fields[RAW_DATA_FIELD[kind]].hex()
+
+
+class RPCMetrics:
+    """
+    Latency and errors of the requests sent to the node, per JSON-RPC method. Calls and
+    transactions are also labelled with the contract function they invoke, found by
+    selector in the ABIs of the artifacts given to `register_artifact`. An artifact's ABI is
+    only read once a request has a selector not found so far and the artifact was already
+    loaded to build its contract, so registering does not load any artifact.
+    """
+
+    def __init__(self, registry):
+        self.latency = registry.histogram(
+            "cfp_node_rpc_seconds", "Latency of the requests sent to the node.", ("method", "function", "transport"))
+        self.errors = registry.counter(
+            "cfp_node_rpc_errors_total", "Requests to the node that failed or returned an error.", ("method", "function"))
+        self.functions = {}
+        self.artifacts = []
+        self.lock = threading.Lock()
+
+    def register_artifact(self, contract, artifact):
+        with self.lock:
+            self.artifacts.append((contract, artifact))
+
+    def register_abi(self, contract, abi):
+        for item in abi:
+            if item.get("type") == "function":
+                self.functions["0x" + function_abi_to_4byte_selector(item).hex()] = f"{contract}.{item['name']}"
+
+    def register_loaded(self):
+        """Registers the ABIs of the artifacts loaded since the last call. Returns whether there was any."""
+        with self.lock:
+            loaded = [(contract, artifact) for contract, artifact in self.artifacts if artifact.loaded()]
+            if not loaded:
+                return False
+            self.artifacts = [entry for entry in self.artifacts if entry not in loaded]
+            for contract, artifact in loaded:
+                self.register_abi(contract, artifact.abi)
+            return True
+
+    def lookup(self, data):
+        selector = data[:10].lower()
+        function = self.functions.get(selector)
+        if function is None and self.register_loaded():
+            function = self.functions.get(selector)
+        return function or "unknown"
+
+    def function(self, method, params):
+        if method == "eth_sendRawTransaction" and params:
+            try:
+                return self.lookup(raw_transaction_data(params[0]))
+            except Exception:
+                return "unknown"
+        if method not in CALL_METHODS or not params or not isinstance(params[0], dict):
+            return ""
+        data = params[0].get("data") or params[0].get("input") or ""
+        if isinstance(data, bytes):
+            data = "0x" + data.hex()
+        return self.lookup(data)
+
+    def middleware(self, make_request, w3):
+        """web3 middleware that times every request made through the provider."""
+        def middleware(method, params):
+            function = self.function(method, params)
+            start = time.perf_counter()
+            try:
+                response = make_request(method, params)
+            except Exception:
+                self.errors.inc((method, function))
+                raise
+            finally:
+                self.latency.observe((method, function, "single"), time.perf_counter() - start)
+            if "error" in response:
+                self.errors.inc((method, function))
+            return response
+        return middleware
+
+    def observe_batch(self, requests, responses, seconds):
+        """Records the requests of a JSON-RPC batch, each with the latency of the whole batch."""
+        failed = {response.get("id") for response in responses or () if "error" in response}
+        for request in requests:
+            method, function = request["method"], self.function(request["method"], request["params"])
+            self.latency.observe((method, function, "batch"), seconds)
+            if responses is None or request["id"] in failed:
+                self.errors.inc((method, function))
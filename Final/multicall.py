@@ -0,0 +1,70 @@
+"""Aggregation of many contract reads into a single `eth_call` through the Multicall contract."""
+from web3.exceptions import BadFunctionCallOutput
+
+from rpc_batch import decode_output, encode_call
+
+# Calls sent in each `tryAggregate`, so one `eth_call` stays under the gas cap of the node
+CHUNK_SIZE = 200
+
+
+class Multicall:
+    """
+    Runs a list of bound contract functions with `Multicall.tryAggregate`, `chunk_size`
+    of them per `eth_call`. When the Multicall contract is not deployed in `network`
+    (e.g. the migrations were run before it was added), each chunk is sent as one
+    JSON-RPC batch instead, which still takes a single round-trip.
+
+    Whether the contract exists is checked again after `invalidate`, e.g. when the chain
+    is reset, and whenever `tryAggregate` returns no data because its code is gone.
+    """
+
+    def __init__(self, w3, rpc, artifact, chunk_size=CHUNK_SIZE):
+        self.w3 = w3
+        self.rpc = rpc
+        self.artifact = artifact
+        self.chunk_size = chunk_size
+        self.contract = None
+        self.deployed = None
+
+    def available(self):
+        """Whether the artifact points to a contract that exists on the current chain."""
+        if self.deployed is None:
+            if self.artifact.deployed():
+                self.contract = self.w3.eth.contract(address=self.artifact.address, abi=self.artifact.abi)
+            self.deployed = self.contract is not None and len(self.w3.eth.get_code(self.contract.address)) > 0
+        return self.deployed
+
+    def invalidate(self):
+        self.deployed = None
+
+    def call(self, functions, block="latest"):
+        """Returns the decoded result of each function in order, None for the ones that revert."""
+        results = []
+        for start in range(0, len(functions), self.chunk_size):
+            chunk = functions[start:start + self.chunk_size]
+            if self.available():
+                try:
+                    results.extend(self.aggregate(chunk, block))
+                    continue
+                except BadFunctionCallOutput:
+                    # Empty return data: there is no contract at the address any more
+                    self.invalidate()
+            results.extend(self.batch_call(chunk, block))
+        return results
+
+    def batch_call(self, functions, block):
+        batch = self.rpc.batch()
+        for function in functions:
+            batch.call(function, block)
+        return batch.execute(strict=False)
+
+    def aggregate(self, functions, block):
+        calls = [(function.address, encode_call(self.w3, function)) for function in functions]
+        returned = self.contract.functions.tryAggregate(False, calls).call(block_identifier=block)
+        results = []
+        for function, (success, data) in zip(functions, returned):
+            try:
+                results.append(decode_output(self.w3.codec, function, data) if success else None)
+            except Exception:
+                results.append(None)
+        return results
@@ -0,0 +1,43 @@
+"""Command line arguments of the API server, shared by its entry points."""
+import argparse
+
+# Functions that add the arguments of an entry point that imports apiserver, like asgi_apiserver.py
+entry_point_arguments = []
+
+
+def entry_point(add_arguments):
+    """
+    Registers a function that adds the arguments of an entry point to the parser.
+    It has to be registered before apiserver is imported, since apiserver parses the command line.
+    """
+    entry_point_arguments.append(add_arguments)
+    return add_arguments
+
+
+def build_parser():
+    """Returns the parser of the arguments of apiserver.py and of the registered entry points."""
+    parser = argparse.ArgumentParser()
+    mnemonic_route = "mnemonic.txt"
+    parser.add_argument('--mnemonic', help = "Mnemonic file name or route", default=mnemonic_route)
+    parser.add_argument('--gport', help = "Ganache port number", default=7545)
+    parser.add_argument('--network', help = "Ganache Network ID", default=5777)
+    parser.add_argument('--build', help = "Route to the folder that contains build folder", default="../6")
+    parser.add_argument('--cache-size', help = "Number of CFP contracts and calls kept in memory", type=int, default=256)
+    parser.add_argument('--confirmations', help = "Blocks on top of a block before its events are indexed", type=int, default=0)
+    parser.add_argument('--index-interval', help = "Seconds between polls of the event indexer", type=float, default=1.0)
+    parser.add_argument('--no-index', help = "Serve every read from the node instead of the event index", action="store_true")
+    parser.add_argument('--signature-ttl', help = "Seconds a recovered signer is remembered for a (message, signature) pair", type=float, default=300.0)
+    parser.add_argument('--negative-ttl', help = "Seconds unauthorized accounts and missing calls are remembered", type=float, default=2.0)
+    parser.add_argument('--recovery-workers', help = "Processes used to recover signers (0 to recover on the request thread)", type=int, default=None)
+    parser.add_argument('--async-writes', help = "Answer write endpoints with 202 and a job ID unless the client asks otherwise", action="store_true")
+    parser.add_argument('--index-db', help = "SQLite file where the event index is kept between restarts (empty to disable)", default="cfp_index.sqlite3")
+    parser.add_argument('--head-interval', help = "Seconds between polls of the latest block header", type=float, default=0.5)
+    parser.add_argument('--multicall-chunk', help = "Reads aggregated in each Multicall eth_call by the bulk endpoints", type=int, default=200)
+    parser.add_argument('--profile', help = "Profile requests sent with the X-Profile header or picked by --profile-rate", action="store_true")
+    parser.add_argument('--profile-rate', help = "Fraction of the requests that are profiled", type=float, default=0.0)
+    parser.add_argument('--profile-threshold', help = "Seconds a profiled request must take for its profile to be kept", type=float, default=1.0)
+    parser.add_argument('--profile-dir', help = "Folder where the newest profiles are kept", default="profiles")
+    parser.add_argument('--profile-keep', help = "Number of profiles kept in --profile-dir", type=int, default=200)
+    for add_arguments in entry_point_arguments:
+        add_arguments(parser)
+    return parser
@@ -0,0 +1,134 @@
+"""Opt-in cProfile capture of slow requests of a Flask application."""
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+
+from flask import g, request
+
+# Request header that forces a request to be profiled and saved
+PROFILE_HEADER = "X-Profile"
+# Functions listed in the summary of each profile
+TOP_FUNCTIONS = 15
+
+
+def top_functions(profile, key, limit=TOP_FUNCTIONS):
+    """Returns the `limit` functions with the highest cumulative ("ct") or own ("tt") time."""
+    stats = pstats.Stats(profile).stats
+    column = {"tt": 2, "ct": 3}[key]
+    rows = sorted(stats.items(), key=lambda item: item[1][column], reverse=True)[:limit]
+    return [{
+        "function": f"{os.path.basename(filename)}:{line}({name})",
+        "calls": calls,
+        "ownSeconds": round(own, 6),
+        "cumulativeSeconds": round(cumulative, 6),
+    } for (filename, line, name), (_, calls, own, cumulative, _) in rows]
+
+
+class RequestProfiler:
+    """
+    Profiles a sample of the requests (`sample_rate`, or those sent with the X-Profile
+    header) and keeps the ones that take at least `threshold` seconds, or were asked
+    for with the header, in `directory`: a .prof file for pstats/snakeviz and a .json
+    summary each. Only the newest `keep` profiles are kept.
+
+    cProfile only follows one thread at a time, so requests that arrive while another
+    one is being profiled are not sampled.
+    """
+
+    def __init__(self, directory, sample_rate=0.0, threshold=1.0, keep=200):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.keep = keep
+        self.busy = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def install(self, app):
+        app.before_request(self.start)
+        app.after_request(self.stop_on_close)
+        app.teardown_request(self.discard)
+
+    def start(self):
+        forced = request.headers.get(PROFILE_HEADER, "").lower() in ("1", "true")
+        if not forced and random.random() >= self.sample_rate:
+            return
+        if not self.busy.acquire(blocking=False):
+            return
+        profile = cProfile.Profile()
+        g.profile = (profile, forced, time.perf_counter())
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is active
+            g.pop("profile")
+            self.busy.release()
+
+    def stop_on_close(self, response):
+        # Streamed responses do their work after the view returns, so profiling stops once they are sent
+        if "profile" in g:
+            profile, forced, start = g.pop("profile")
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            method, path, status = request.method, request.full_path.rstrip("?"), response.status_code
+            response.call_on_close(lambda: self.stop(profile, forced, start, method, route, path, status))
+        return response
+
+    def discard(self, exception=None):
+        """Stops the profiler of a request that ended without a response, e.g. because of an error."""
+        if "profile" in g:
+            g.pop("profile")[0].disable()
+            self.busy.release()
+
+    def stop(self, profile, forced, start, method, route, path, status):
+        profile.disable()
+        self.busy.release()
+        seconds = time.perf_counter() - start
+        if forced or seconds >= self.threshold:
+            self.save(profile, {
+                "method": method,
+                "route": route,
+                "path": path,
+                "status": status,
+                "seconds": round(seconds, 6),
+                "time": time.time(),
+            })
+
+    def save(self, profile, summary):
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", summary["route"]).strip("-") or "root"
+        name = f"{int(summary['time'] * 1000)}-{summary['method']}-{slug}-{int(summary['seconds'] * 1000)}ms"
+        summary["name"] = name
+        summary["topCumulative"] = top_functions(profile, "ct")
+        summary["topOwn"] = top_functions(profile, "tt")
+        profile.dump_stats(os.path.join(self.directory, name + ".prof"))
+        with open(os.path.join(self.directory, name + ".json"), "w") as f:
+            json.dump(summary, f)
+        self.rotate()
+
+    def rotate(self):
+        names = sorted(file[:-5] for file in os.listdir(self.directory) if file.endswith(".json"))
+        for name in names[:max(0, len(names) - self.keep)]:
+            for extension in (".json", ".prof"):
+                try:
+                    os.remove(os.path.join(self.directory, name + extension))
+                except FileNotFoundError:
+                    pass
+
+    def summaries(self, limit=20, route=None):
+        """Returns the summaries of the slowest saved profiles, optionally only those of `route`."""
+        summaries = []
+        for file in os.listdir(self.directory):
+            if not file.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, file)) as f:
+                    summary = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if route is None or summary["route"] == route:
+                summaries.append(summary)
+        summaries.sort(key=lambda summary: summary["seconds"], reverse=True)
+        return summaries[:limit]
@@ -0,0 +1,186 @@
+"""Tracking of asynchronous write jobs until their transactions are mined."""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+# Completed jobs kept so clients can still poll them
+MAX_FINISHED_JOBS = 10000
+
+
+class Job:
+    """A write request whose transaction is followed by the ReceiptPoller."""
+
+    def __init__(self, pending=None, tx_hash=None, on_mined=None):
+        self.id = uuid.uuid4().hex
+        self.pending = pending
+        self.tx_hash = tx_hash
+        self.on_mined = on_mined
+        self.status = "queued" if tx_hash is None else "pending"
+        self.block_number = None
+        self.reason = None
+        self.done = threading.Event()
+
+    def finish(self, status, block_number=None, reason=None):
+        self.status = status
+        self.block_number = block_number
+        self.reason = reason
+        self.done.set()
+
+    def wait(self, timeout=None):
+        """Waits until the transaction is mined or fails. Returns whether it finished in time."""
+        return self.done.wait(timeout)
+
+    def to_json(self):
+        result = {"jobId": self.id, "status": self.status}
+        if self.tx_hash is not None:
+            result["transactionHash"] = Web3.to_hex(self.tx_hash)
+        if self.block_number is not None:
+            result["blockNumber"] = self.block_number
+        if self.reason is not None:
+            result["reason"] = self.reason
+        return result
+
+
+class ReceiptPoller:
+    """
+    Follows every outstanding job from a single thread. For each new block it makes one
+    `eth_getBlockByNumber` request and only asks for the receipts of the transactions
+    that belong to tracked jobs. Reverted transactions are replayed with `eth_call`
+    on the parent block to obtain the revert reason.
+    """
+
+    def __init__(self, w3, interval=0.5):
+        self.w3 = w3
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()
+        self.by_hash = {}
+        self.last_block = None
+        self.listeners = []
+
+    def subscribe(self, listener):
+        """Adds a function called without arguments whenever a tracked transaction is mined."""
+        self.listeners.append(listener)
+
+    def start(self):
+        self.last_block = self.w3.eth.block_number
+        threading.Thread(target=self.run, name="receipt-poller", daemon=True).start()
+
+    def track(self, pending=None, tx_hash=None, on_mined=None):
+        """
+        Creates a job for a PendingTransaction of the pipeline, or for an already sent `tx_hash`.
+        `on_mined` is called without arguments once the transaction is mined successfully.
+        """
+        job = Job(pending, tx_hash, on_mined)
+        with self.lock:
+            self.jobs[job.id] = job
+            if tx_hash is not None:
+                self.by_hash[bytes(tx_hash)] = job
+            self.prune()
+        if tx_hash is not None:
+            # The transaction may have been mined before it was tracked
+            self.check_receipt(job)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.done.is_set()]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            self.jobs.pop(job_id)
+
+    def run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                print("Error while polling receipts:", e)
+            time.sleep(self.interval)
+
+    def poll(self):
+        self.collect_sent()
+        head = self.w3.eth.block_number
+        if head < self.last_block:
+            # The node was reset or restarted: the blocks already seen are gone, so the
+            # outstanding transactions are looked up directly and new blocks followed from the head
+            self.last_block = head
+            with self.lock:
+                outstanding = list(self.by_hash.values())
+            for job in outstanding:
+                self.check_receipt(job)
+        while self.last_block < head:
+            self.last_block += 1
+            with self.lock:
+                if not self.by_hash:
+                    continue
+            block = self.w3.eth.get_block(self.last_block)
+            for tx_hash in block.transactions:
+                with self.lock:
+                    job = self.by_hash.get(bytes(tx_hash))
+                if job:
+                    self.check_receipt(job)
+
+    def collect_sent(self):
+        """
+        Moves the jobs whose transactions were handed to the node from queued to pending,
+        and fails the pending ones whose transactions the pipeline reported as dropped.
+        """
+        with self.lock:
+            queued = [job for job in self.jobs.values() if job.status == "queued"]
+            dropped = [job for job in self.jobs.values()
+                       if job.status == "pending" and job.pending is not None and job.pending.dropped]
+        for job in dropped:
+            with self.lock:
+                self.by_hash.pop(bytes(job.tx_hash), None)
+            job.finish("failed", reason="dropped")
+        for job in queued:
+            if not job.pending.sent.is_set():
+                continue
+            if job.pending.error:
+                job.finish("failed", reason=str(job.pending.error))
+                continue
+            job.tx_hash = job.pending.hash
+            job.status = "pending"
+            with self.lock:
+                self.by_hash[bytes(job.tx_hash)] = job
+            self.check_receipt(job)
+
+    def check_receipt(self, job):
+        try:
+            receipt = self.w3.eth.get_transaction_receipt(job.tx_hash)
+        except TransactionNotFound:
+            return
+        with self.lock:
+            self.by_hash.pop(bytes(job.tx_hash), None)
+        if receipt.status == 1:
+            job.finish("mined", receipt.blockNumber)
+            if job.on_mined is not None:
+                job.on_mined()
+            for listener in self.listeners:
+                listener()
+        else:
+            job.finish("reverted", receipt.blockNumber, self.revert_reason(job.tx_hash, receipt.blockNumber))
+
+    def revert_reason(self, tx_hash, block_number):
+        transaction = self.w3.eth.get_transaction(tx_hash)
+        try:
+            self.w3.eth.call({
+                "from": transaction["from"],
+                "to": transaction["to"],
+                "data": transaction["input"],
+                "value": transaction["value"],
+            }, block_number - 1)
+        except Exception as e:
+            return str(e)
+        return None
+
+    def outstanding(self):
+        """Number of jobs whose transactions have not been mined yet."""
+        with self.lock:
+            return sum(1 for job in self.jobs.values() if not job.done.is_set())
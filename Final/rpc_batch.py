@@ -0,0 +1,150 @@
+"""Batching of independent JSON-RPC requests to the node over a pooled HTTP session."""
+import time
+
+import requests
+from eth_utils import to_checksum_address
+from eth_utils.abi import collapse_if_tuple
+from requests.adapters import HTTPAdapter
+
+from cache import LRUCache
+
+# Block fields returned as hexadecimal quantities that are converted to int
+BLOCK_QUANTITIES = ("number", "timestamp", "gasLimit", "gasUsed", "baseFeePerGas", "size")
+
+
+# Contract classes used to encode calls, by contract address
+encoders = LRUCache(1024)
+
+
+class RPCError(Exception):
+    """Error returned by the node for one request of a batch."""
+
+
+def pooled_session(pool_size=32):
+    """Returns a requests session that keeps up to `pool_size` connections open to the node."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def normalize(output, value):
+    """Checksums the addresses of a decoded value, as web3 does for contract calls."""
+    kind = output["type"]
+    if kind == "address":
+        return to_checksum_address(value)
+    if kind == "address[]":
+        return [to_checksum_address(item) for item in value]
+    if kind == "tuple":
+        return tuple(normalize(component, item) for component, item in zip(output["components"], value))
+    if kind == "tuple[]":
+        return [normalize(dict(output, type="tuple"), item) for item in value]
+    return value
+
+
+def encode_call(w3, function):
+    """Returns the calldata (hex) of a bound contract function, encoded with the public `encodeABI`."""
+    contract = encoders.get(function.address)
+    if contract is None:
+        contract = w3.eth.contract(address=function.address, abi=function.contract_abi)
+        encoders.put(function.address, contract)
+    return contract.encodeABI(fn_name=function.fn_name, args=function.args, kwargs=function.kwargs)
+
+
+def decode_output(codec, function, data):
+    """Decodes the return data (bytes) of a bound contract function as `function.call()` would."""
+    outputs = function.abi["outputs"]
+    values = codec.decode([collapse_if_tuple(output) for output in outputs], data)
+    values = [normalize(output, value) for output, value in zip(outputs, values)]
+    return values[0] if len(values) == 1 else values
+
+
+class RPCBatch:
+    """Collects requests and sends them to the node as a single JSON-RPC batch."""
+
+    def __init__(self, client):
+        self.client = client
+        self.requests = []
+        self.decoders = []
+
+    def add(self, method, params, decoder):
+        """Queues a request and returns its position in the results of `execute`."""
+        self.requests.append({"jsonrpc": "2.0", "id": len(self.requests), "method": method, "params": params})
+        self.decoders.append(decoder)
+        return len(self.requests) - 1
+
+    def call(self, function, block="latest"):
+        """Queues an `eth_call` of a bound contract function, decoded like `function.call()`."""
+        def decode(result):
+            return decode_output(self.client.w3.codec, function, bytes.fromhex(result[2:]))
+
+        transaction = {"to": function.address, "data": encode_call(self.client.w3, function)}
+        return self.add("eth_call", [transaction, block], decode)
+
+    def get_block(self, block="latest"):
+        """Queues an `eth_getBlockByNumber` without full transactions."""
+        if isinstance(block, int):
+            block = hex(block)
+
+        def decode(result):
+            for field in BLOCK_QUANTITIES:
+                if result.get(field) is not None:
+                    result[field] = int(result[field], 16)
+            return result
+
+        return self.add("eth_getBlockByNumber", [block, False], decode)
+
+    def execute(self, strict=True):
+        """
+        Sends every queued request in one HTTP request and returns their decoded results in order.
+        With `strict=False`, requests that fail or cannot be decoded give None instead of raising.
+        """
+        if not self.requests:
+            return []
+        responses = self.client.post(self.requests)
+        by_id = {response["id"]: response for response in responses}
+        results = []
+        for request, decoder in zip(self.requests, self.decoders):
+            response = by_id[request["id"]]
+            if "error" in response:
+                if strict:
+                    raise RPCError(f"{request['method']}: {response['error'].get('message')}")
+                results.append(None)
+            elif strict:
+                results.append(decoder(response["result"]))
+            else:
+                try:
+                    results.append(decoder(response["result"]))
+                except Exception:
+                    results.append(None)
+        return results
+
+
+class RPCClient:
+    """
+    Sends JSON-RPC batches to `endpoint_uri` through `session`. If given, `observe` is
+    called with the requests, the responses (None if the batch failed) and the seconds taken.
+    """
+
+    def __init__(self, w3, endpoint_uri, session, timeout=10, observe=None):
+        self.w3 = w3
+        self.endpoint_uri = endpoint_uri
+        self.session = session
+        self.timeout = timeout
+        self.observe = observe
+
+    def batch(self):
+        return RPCBatch(self)
+
+    def post(self, payload):
+        start = time.perf_counter()
+        responses = None
+        try:
+            response = self.session.post(self.endpoint_uri, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            responses = response.json()
+            return responses
+        finally:
+            if self.observe:
+                self.observe(payload, responses, time.perf_counter() - start)
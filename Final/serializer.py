@@ -0,0 +1,99 @@
+"""
+JSON encoding of API responses, with orjson when it is installed, and a cache of
+encoded list responses validated with ETag/If-None-Match.
+"""
+import hashlib
+import json
+
+from flask import Response, request
+
+from cache import LRUCache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(value):
+    """Encodes `value` as compact JSON bytes with sorted keys, like `jsonify` does outside debug mode."""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(value, separators=(",", ":"), sort_keys=True).encode()
+
+
+def hex_many(values):
+    """
+    Same result as `[value.hex() for value in values]` for byte strings of equal length
+    (bytes32 identifiers, addresses), converting all of them with a single hex() call.
+    """
+    if not values:
+        return []
+    width = len(values[0]) * 2
+    data = b"".join(values).hex()
+    if width == 0 or len(data) != width * len(values):
+        return [value.hex() for value in values]
+    # HexBytes older than 1.0 prefixes its hex() with "0x", plain bytes do not
+    prefix = values[0].hex()[:-width]
+    return [prefix + data[start:start + width] for start in range(0, len(data), width)]
+
+
+class ResponseCache:
+    """
+    Encoded bodies of list responses, keyed by request path and query. Each entry stores
+    the version of the data it was built from (e.g. the index version or the chain head
+    hash) and is only reused while that version is current.
+
+    Every response carries an ETag derived from its body, so a client that sends it back
+    in If-None-Match gets a 304 without the body being built or encoded again.
+
+    `invalidate` discards every entry at once, e.g. when a write of the server is mined
+    before the version of the data it changed is seen to move.
+    """
+
+    def __init__(self, maxsize=256):
+        self.entries = LRUCache(maxsize)
+        self.generation = 0
+
+    def invalidate(self):
+        self.generation += 1
+
+    def lookup(self, key, version):
+        """
+        Returns the version a body for `key` built now is stored under, and the cached
+        `(body, etag)` if it was built from that version. Nothing is cached without a `version`.
+        """
+        if version is None:
+            return None, None
+        # Read before building, so a body built while an invalidation happens is not kept as current
+        version = (self.generation, version)
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != version:
+            return version, None
+        return version, entry[1:]
+
+    def store(self, key, version, value):
+        """Encodes `value`, keeps it for `key` if `version` is known and returns `(body, etag)`."""
+        body = dumps(value)
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        if version is not None:
+            self.entries.put(key, (version, body, etag))
+        return body, etag
+
+    def respond(self, version, build):
+        """
+        Answers the current request with the body `build()` returns. Without a `version`
+        nothing is cached, but the response still gets an ETag.
+        """
+        key = request.full_path
+        version, cached = self.lookup(key, version)
+        body, etag = cached if cached is not None else self.store(key, version, build())
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, 200, mimetype="application/json")
+        response.set_etag(etag)
+        return response
+
+    def stats(self):
+        return self.entries.stats()
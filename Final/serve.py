@@ -0,0 +1,94 @@
+"""
+Production launcher of apiserver.py: runs the Flask application in several pre-forked
+gunicorn workers. Artifacts are loaded and the owner account is derived once, in the
+master, before forking; every worker then starts its own background services.
+
+The caches of apiserver.py live in each worker. A write only forgets the negative
+entries (unauthorized accounts, missing calls) of the worker that sent it; the other
+workers keep theirs until they expire, so a request they answer may still see the old
+state for up to `--negative-ttl` seconds. Clients that need to read their own writes
+across workers can run with `--negative-ttl 0`.
+"""
+import fcntl
+import os
+
+from gunicorn.app.base import BaseApplication
+
+import options
+
+
+@options.entry_point
+def add_arguments(parser):
+    parser.add_argument('--bind', help = "Address and port where the server listens", default="127.0.0.1:5000")
+    parser.add_argument('--workers', help = "Number of worker processes", type=int, default=4)
+    parser.add_argument('--threads', help = "Request threads of each worker", type=int, default=8)
+    parser.add_argument('--nonce-file', help = "File, locked by the workers, that holds the next nonce of the owner", default="owner.nonce")
+
+
+# apiserver parses the command line on import, with the arguments registered above
+import apiserver
+from apiserver import args
+
+# Lock held for its whole life by the worker that writes the SQLite snapshot of the index
+index_writer_lock = None
+
+
+def elect_index_writer():
+    """
+    The first worker that takes the lock of the SQLite snapshot writes it; the rest
+    only restore from it on start and keep their index in memory.
+    """
+    global index_writer_lock
+    store = apiserver.index_store
+    if store is None:
+        return
+    lock = open(store.path + ".lock", "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        index_writer_lock = lock
+    except BlockingIOError:
+        lock.close()
+    store.reopen(read_only=index_writer_lock is None)
+
+
+def post_fork(server, worker):
+    elect_index_writer()
+    apiserver.start_services()
+
+
+class APIServer(BaseApplication):
+    """Runs a WSGI application with gunicorn, configured from a dict instead of the command line."""
+
+    def __init__(self, application, options):
+        self.application = application
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+if __name__ == '__main__':
+    try:
+        apiserver.load_owner(apiserver.args.mnemonic, args.nonce_file)
+        # The chain may have been reset since the last run, so the nonce is read from it again
+        apiserver.tx_pipeline.nonces.reset()
+        # Every worker starts its own recovery pool, so by default the CPUs are divided among them
+        if apiserver.args.recovery_workers is None:
+            apiserver.signature_recovery.workers = max(1, (os.cpu_count() or 1) // args.workers)
+
+        APIServer(apiserver.app, {
+            "bind": args.bind,
+            "workers": args.workers,
+            "threads": args.threads,
+            "worker_class": "gthread",
+            "preload_app": True,
+            "post_fork": post_fork,
+        }).run()
+
+    except Exception as error:
+        print("Se ha producido un error", error)
@@ -0,0 +1,76 @@
+"""Recovery of message signers in a pool of worker processes."""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+from cache import TTLCache
+
+
+def recover(message, signature):
+    """Returns the address that signed `message` (bytes, before `encode_defunct`) with `signature`."""
+    return Account.recover_message(encode_defunct(message), signature=signature)
+
+
+def try_recover(item):
+    """Like `recover`, but takes a (message, signature) pair and returns None for invalid signatures."""
+    message, signature = item
+    try:
+        return recover(message, signature)
+    except Exception:
+        return None
+
+
+class SignatureRecovery:
+    """
+    Runs ECDSA public key recovery, which is CPU bound and holds the GIL, in a pool
+    of processes shared by every request handler. With `workers=0` it runs inline.
+
+    Recovered signers are memoized by (message, signature) for `ttl` seconds, since
+    clients retry requests with identical payloads.
+    """
+
+    def __init__(self, workers=None, cache_size=10000, ttl=300.0):
+        self.workers = os.cpu_count() if workers is None else workers
+        self.pool = None
+        self.cache = TTLCache(cache_size, ttl)
+
+    def start(self):
+        """
+        Creates the pool. Workers are forked right away, so this must be called before
+        the server starts any thread.
+        """
+        if self.workers == 0:
+            return
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("fork"))
+        self.pool.submit(int).result()
+
+    def recover(self, message, signature):
+        key = (bytes(message), signature.lower())
+        signer = self.cache.get(key)
+        if signer is None:
+            if self.pool is None:
+                signer = recover(message, signature)
+            else:
+                signer = self.pool.submit(recover, message, signature).result()
+            self.cache.put(key, signer)
+        return signer
+
+    def recover_many(self, items):
+        """Recovers the signers of a list of (message, signature) pairs, None for invalid ones."""
+        keys = [(bytes(message), signature.lower()) for message, signature in items]
+        signers = [self.cache.get(key) for key in keys]
+        missing = [i for i, signer in enumerate(signers) if signer is None]
+        to_recover = [items[i] for i in missing]
+        if self.pool is None:
+            recovered = [try_recover(item) for item in to_recover]
+        else:
+            chunksize = max(1, len(to_recover) // (4 * self.workers))
+            recovered = list(self.pool.map(try_recover, to_recover, chunksize=chunksize))
+        for i, signer in zip(missing, recovered):
+            signers[i] = signer
+            if signer is not None:
+                self.cache.put(keys[i], signer)
+        return signers
@@ -1,7 +1,9 @@
 """Casos de prueba para el servidor de APIs."""
+import json
 from datetime import datetime
 from os import urandom
 from random import randrange
+from time import sleep
 from typing import Optional, Union
 
 import requests
@@ -243,6 +245,57 @@ def test_register_invalid_signature() -> None:
         assert response.status_code == 400
 
 
+def test_register_async() -> None:
+    """Prueba el registro asincrónico de una dirección, siguiendo la tarea hasta que se mina."""
+    contract_address = get_contract_address()
+    account = Account().create()
+    signature = sign(contract_address, account)
+    response = requests.post(
+        url("register") + "?async=true",
+        json={
+            "address": account.address,
+            "signature": signature},
+        timeout=10)
+    assert APPLICATION_JSON in response.headers['Content-type']
+    assert response.status_code == 202
+    job_id = response.json()["jobId"]
+    for _ in range(50):
+        response = requests.get(url("jobs", job_id), timeout=3)
+        assert response.status_code == 200
+        if response.json()["status"] not in ("queued", "pending"):
+            break
+        sleep(0.1)
+    assert response.json()["status"] == "mined"
+    response = requests.get(url("authorized", account.address), timeout=3)
+    assert response.json()["authorized"]
+    response = requests.get(url("jobs", "unknown"), timeout=3)
+    assert response.status_code == 404
+    validate(instance=response.json(), schema=message_schema)
+    assert response.json()["message"].startswith(messages.JOB_NOT_FOUND)
+
+
+def test_register_batch() -> None:
+    """Prueba el registro de varias direcciones en un solo pedido."""
+    contract_address = get_contract_address()
+    batch = [Account().create() for _ in range(5)]
+    registrations = [{"address": account.address, "signature": sign(contract_address, account)} for account in batch]
+    registrations.append({"address": batch[0].address, "signature": sign(contract_address, batch[1])})
+    registrations.append({"address": "0x0", "signature": random_signature()})
+    response = requests.post(url("register/batch"), json={"registrations": registrations}, timeout=30)
+    assert APPLICATION_JSON in response.headers['Content-type']
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == len(registrations)
+    for result in results[:5]:
+        assert result["status"] == 200
+        assert result["message"] == messages.OK
+    assert results[5]["message"].startswith(messages.INVALID_SIGNATURE)
+    assert results[6]["message"].startswith(messages.INVALID_ADDRESS)
+    for account in batch:
+        response = requests.get(url("authorized", account.address), timeout=3)
+        assert response.json()["authorized"]
+
+
 def test_authorized() -> None:
     """Prueba que una dirección registrada esté autorizada."""
     assert len(accounts) > 0
@@ -254,6 +307,24 @@ def test_authorized() -> None:
         assert response.json()["authorized"]
 
 
+def test_authorized_many() -> None:
+    """Prueba la consulta de autorización de varias direcciones en un solo pedido."""
+    assert len(accounts) > 0
+    addresses = [account.address for account in accounts] + [random_address(), "0x0"]
+    response = requests.post(url("authorized"), json={"addresses": addresses}, timeout=10)
+    assert APPLICATION_JSON in response.headers['Content-type']
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["address"] for result in results] == addresses
+    for result in results[:len(accounts)]:
+        assert result["authorized"]
+    assert not results[-2]["authorized"]
+    assert results[-1]["message"].startswith(messages.INVALID_ADDRESS)
+    response = requests.post(url("authorized"), json={"addresses": []}, timeout=3)
+    assert response.status_code == 400
+    assert response.json()["message"].startswith(messages.INVALID_BATCH)
+
+
 def test_register_invalid_mimetype() -> None:
     """Prueba que el registro con un tipo de contenido inválido falle."""
     account = Account().create()
@@ -428,6 +499,54 @@ def test_created_closing_time() -> None:
         assert response.json()["message"].startswith(messages.INVALID_CALLID)
 
 
+def test_calls_pagination() -> None:
+    """Prueba que recorrer los llamados por páginas devuelva la misma lista que sin paginar."""
+    assert len(calls) > 0
+    response = requests.get(url("calls"), timeout=3)
+    assert response.status_code == 200
+    all_calls = [call["callId"] for call in response.json()["callsList"]]
+    paged = []
+    params = {"limit": 3}
+    while True:
+        response = requests.get(url("calls"), params=params, timeout=3)
+        assert APPLICATION_JSON in response.headers['Content-type']
+        assert response.status_code == 200
+        assert len(response.json()["callsList"]) <= 3
+        paged += [call["callId"] for call in response.json()["callsList"]]
+        if response.json()["nextCursor"] is None:
+            break
+        params["cursor"] = response.json()["nextCursor"]
+    assert paged == all_calls
+    for params in [{"limit": 0}, {"limit": "x"}, {"cursor": -1}]:
+        response = requests.get(url("calls"), params=params, timeout=3)
+        assert APPLICATION_JSON in response.headers['Content-type']
+        assert response.status_code == 400
+        validate(instance=response.json(), schema=message_schema)
+        assert response.json()["message"].startswith(messages.INVALID_PAGINATION)
+
+
+def test_calls_filters() -> None:
+    """Prueba el filtrado de llamados por creador y tiempo de cierre en formato NDJSON."""
+    assert len(calls) > 0
+    for call_id, data in calls.items():
+        response = requests.get(
+            url("calls"),
+            params={
+                "creator": data["creator"],
+                "closingAfter": data["closingTime"].isoformat(),
+                "closingBefore": data["closingTime"].isoformat(),
+                "format": "ndjson"},
+            timeout=3)
+        assert "application/x-ndjson" in response.headers['Content-type']
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert call_id in [line["callId"] for line in lines]
+        assert all(line["creator"] == data["creator"] for line in lines)
+    response = requests.get(url("calls"), params={"creator": "0x0"}, timeout=3)
+    assert response.status_code == 400
+    assert response.json()["message"].startswith(messages.INVALID_ADDRESS)
+
+
 def test_contract_address() -> None:
     """Prueba que devuelva la dirección del contrato."""
     get_contract_address()
@@ -467,6 +586,26 @@ def test_register_proposal() -> None:
         assert response.status_code == 403
         assert response.json()["message"].startswith(messages.ALREADY_REGISTERED)
 
+def test_proposal_data_many() -> None:
+    """Prueba la consulta de varias propuestas de un llamado en un solo pedido."""
+    assert len(calls) > 0
+    call_id = next(iter(calls))
+    registered = random_hash()
+    assert post_register_proposal(call_id, registered).status_code == 201
+    proposals = [registered, random_hash(), "0x0"]
+    response = requests.post(url("proposal-data", call_id), json={"proposals": proposals}, timeout=10)
+    assert APPLICATION_JSON in response.headers['Content-type']
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["proposal"] for result in results] == proposals
+    assert results[0]["sender"] == get_contract_owner()
+    assert results[0]["blockNumber"] > 0
+    assert results[1]["message"] == messages.PROPOSAL_NOT_FOUND
+    assert results[2]["message"].startswith(messages.INVALID_PROPOSAL)
+    response = requests.post(url("proposal-data", random_hash()), json={"proposals": proposals}, timeout=3)
+    assert response.status_code == 404
+    assert response.json()["message"].startswith(messages.CALLID_NOT_FOUND)
+
 def test_register_proposal_invalid_mimetype() -> None:
     """Prueba que una dirección registrada no pueda registrar una propuesta con un mimetype inválido."""
     assert len(calls) > 0
@@ -0,0 +1,24 @@
+"""Formatting of on-chain timestamps in the time zone of the API."""
+from datetime import datetime
+from functools import lru_cache
+
+from pytz import timezone
+
+TIME_ZONE = timezone("America/Argentina/Buenos_Aires")
+# Distinct timestamps whose ISO form is remembered
+CACHE_SIZE = 65536
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def isoformat(timestamp):
+    """
+    Returns the ISO 8601 form of a Unix timestamp in TIME_ZONE. Memoized, since the
+    timestamps served (closing times, proposal timestamps) never change once on chain.
+    """
+    return datetime.fromtimestamp(timestamp, TIME_ZONE).isoformat()
+
+
+def isoformat_many(timestamps):
+    """Formats a list of timestamps, looking up each distinct value only once."""
+    formatted = {timestamp: isoformat(timestamp) for timestamp in set(timestamps)}
+    return [formatted[timestamp] for timestamp in timestamps]
@@ -0,0 +1,278 @@
+"""Submission of transactions signed locally with the owner account."""
+import fcntl
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from web3.exceptions import TransactionNotFound
+
+# Fragments of the errors returned by geth and Ganache when a nonce is out of date
+NONCE_ERRORS = ("nonce too low", "correct nonce", "already known", "replacement transaction underpriced")
+# Hashes of dropped transactions remembered for /transactions/<tx_hash>
+MAX_DROPPED = 10000
+
+
+def is_nonce_error(error):
+    message = str(error).lower()
+    return any(fragment in message for fragment in NONCE_ERRORS)
+
+
+class NonceManager:
+    """Keeps the next nonce of an account locally, resynchronizing it from the chain when needed."""
+
+    def __init__(self, w3, address):
+        self.w3 = w3
+        self.address = address
+        self.lock = threading.Lock()
+        self._next = None
+
+    def allocate(self):
+        with self.lock:
+            if self._next is None:
+                self._next = self.w3.eth.get_transaction_count(self.address, "pending")
+            nonce = self._next
+            self._next += 1
+            return nonce
+
+    def release(self, nonce):
+        """Gives back a nonce whose transaction was never accepted by the node."""
+        with self.lock:
+            if self._next == nonce + 1:
+                self._next = nonce
+            else:
+                self._next = None
+
+    def resync(self):
+        with self.lock:
+            self._next = self.w3.eth.get_transaction_count(self.address, "pending")
+
+    @contextmanager
+    def sending(self):
+        """Yields the manager to allocate the nonce of a transaction while it is signed and sent."""
+        yield self
+
+
+class LockedNonces:
+    """Operations of a SharedNonceManager on its stored state, while its file is locked."""
+
+    def __init__(self, manager, state):
+        self.manager = manager
+        self.state = state
+
+    def pending_count(self):
+        return self.manager.w3.eth.get_transaction_count(self.manager.address, "pending")
+
+    def allocate(self):
+        if self.state["next"] is None:
+            self.state["next"] = self.pending_count()
+        nonce = self.state["next"]
+        self.state["next"] += 1
+        return nonce
+
+    def release(self, nonce):
+        self.state["next"] = nonce if self.state["next"] == nonce + 1 else None
+
+    def resync(self):
+        self.state["next"] = self.pending_count()
+
+
+class SharedNonceManager(NonceManager):
+    """
+    NonceManager for several processes sending from the same account. The next nonce
+    is kept in the file `path`, which is locked with `flock` while it is read and
+    updated, so no two processes are given the same nonce.
+
+    The pipeline keeps the file locked from the allocation of a nonce until the node
+    accepts or rejects its transaction (see `sending`). So whenever the nonce is read
+    again from the pending transaction count, no other process holds an allocated
+    nonce that the node has not counted yet.
+    """
+
+    def __init__(self, w3, address, path):
+        super().__init__(w3, address)
+        self.path = path
+
+    @contextmanager
+    def locked(self):
+        """Yields a dict whose "next" entry is the stored next nonce (None if unknown) and saves it back."""
+        with self.lock, open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                content = f.read().strip()
+                state = {"next": int(content) if content else None}
+                yield state
+                f.seek(0)
+                f.truncate()
+                if state["next"] is not None:
+                    f.write(str(state["next"]))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @contextmanager
+    def sending(self):
+        """Holds the file lock while a transaction is signed and sent, yielding its LockedNonces."""
+        with self.locked() as state:
+            yield LockedNonces(self, state)
+
+    def allocate(self):
+        with self.sending() as nonces:
+            return nonces.allocate()
+
+    def release(self, nonce):
+        with self.sending() as nonces:
+            nonces.release(nonce)
+
+    def resync(self):
+        with self.sending() as nonces:
+            nonces.resync()
+
+    def reset(self):
+        """Forgets the stored nonce, e.g. on startup, since the chain may have been reset meanwhile."""
+        with self.locked() as state:
+            state["next"] = None
+
+
+class PendingTransaction:
+    """A transaction queued in a TransactionPipeline."""
+
+    def __init__(self, transaction):
+        self.transaction = transaction
+        self.hash = None
+        self.nonce = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.dropped = False
+        self.sent = threading.Event()
+
+    def wait(self, timeout=None):
+        """Waits until the transaction is accepted by the node and returns its hash."""
+        if not self.sent.wait(timeout):
+            raise TimeoutError("Transaction was not sent in time")
+        if self.error:
+            raise self.error
+        return self.hash
+
+
+class TransactionPipeline:
+    """
+    Signs transactions offline with `account` and sends them with `send_raw_transaction`
+    from a single background thread, which owns the account's nonce.
+
+    If the node reports a stale nonce, it is resynchronized from the chain and the
+    transaction is signed again. Sent transactions that disappear from the node
+    without being mined are considered dropped, and also cause a resync.
+    """
+
+    def __init__(self, w3, account, max_retries=3, check_interval=5.0, drop_timeout=60.0, nonces=None):
+        self.w3 = w3
+        self.account = account
+        self.nonces = nonces or NonceManager(w3, account.address)
+        self.max_retries = max_retries
+        self.check_interval = check_interval
+        self.drop_timeout = drop_timeout
+        self.chain_id = None
+        self.queue = queue.Queue()
+        self.outstanding = {}
+        self.dropped = OrderedDict()
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.chain_id = self.w3.eth.chain_id
+        threading.Thread(target=self.run, name="tx-pipeline", daemon=True).start()
+
+    def submit(self, function):
+        """
+        Builds a transaction calling the contract function `function` from the account and queues it.
+        Gas is estimated here, so a call that would revert raises before anything is queued.
+        """
+        transaction = function.build_transaction({"from": self.account.address, "chainId": self.chain_id})
+        pending = PendingTransaction(transaction)
+        self.queue.put(pending)
+        return pending
+
+    def run(self):
+        # Outstanding transactions are checked every `check_interval` seconds, even while the queue is busy
+        next_check = time.monotonic() + self.check_interval
+        while True:
+            try:
+                self.send(self.queue.get(timeout=max(0.0, next_check - time.monotonic())))
+            except queue.Empty:
+                pass
+            if time.monotonic() >= next_check:
+                self.check_outstanding()
+                next_check = time.monotonic() + self.check_interval
+
+    def send(self, pending):
+        with self.nonces.sending() as nonces:
+            for attempt in range(self.max_retries):
+                nonce = nonces.allocate()
+                signed = self.account.sign_transaction(dict(pending.transaction, nonce=nonce))
+                try:
+                    tx_hash = self.w3.eth.send_raw_transaction(signed.rawTransaction)
+                except Exception as e:
+                    if is_nonce_error(e):
+                        nonces.resync()
+                        if attempt < self.max_retries - 1:
+                            continue
+                    else:
+                        nonces.release(nonce)
+                    pending.error = e
+                    break
+                pending.hash = tx_hash
+                pending.nonce = nonce
+                with self.lock:
+                    self.outstanding[tx_hash] = pending
+                break
+        pending.sent.set()
+
+    def check_outstanding(self):
+        """Forgets mined transactions and detects the ones dropped by the node."""
+        with self.lock:
+            outstanding = list(self.outstanding.items())
+        for tx_hash, pending in outstanding:
+            try:
+                self.w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                if time.time() - pending.submitted_at < self.drop_timeout or self.is_known(tx_hash):
+                    continue
+                print(f"Transaction {tx_hash.hex()} with nonce {pending.nonce} was dropped")
+                pending.dropped = True
+                with self.lock:
+                    self.dropped[tx_hash] = True
+                    while len(self.dropped) > MAX_DROPPED:
+                        self.dropped.popitem(last=False)
+                self.nonces.resync()
+            with self.lock:
+                self.outstanding.pop(tx_hash, None)
+
+    def is_known(self, tx_hash):
+        try:
+            self.w3.eth.get_transaction(tx_hash)
+            return True
+        except TransactionNotFound:
+            return False
+
+    def status(self, tx_hash):
+        """Returns the state of the transaction `tx_hash` as a dict, or None if the node does not know it."""
+        try:
+            receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+            return {
+                "status": "mined" if receipt.status == 1 else "reverted",
+                "blockNumber": receipt.blockNumber,
+            }
+        except TransactionNotFound:
+            pass
+        if tx_hash in self.dropped:
+            return {"status": "dropped"}
+        if self.is_known(tx_hash):
+            return {"status": "pending"}
+        return None
+
+    def in_flight(self):
+        """Number of transactions queued or sent but not yet mined."""
+        with self.lock:
+            return self.queue.qsize() + len(self.outstanding)
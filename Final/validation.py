@@ -0,0 +1,40 @@
+"""
+Input validation shared by the API servers: precompiled patterns and a memoized
+checksum of addresses.
+
+Other folders of the repository import it by appending this folder to `sys.path`.
+"""
+import re
+from functools import lru_cache
+
+from eth_utils import to_checksum_address
+
+ADDRESS_PATTERN = re.compile(r"^0x[a-fA-F0-9]{40}$")
+HASH_PATTERN = re.compile(r"^0x[0-9a-fA-F]{64}$")
+# A signature is 65 bytes (r, s, v) after a two character prefix
+SIGNATURE_BODY_PATTERN = re.compile(r"[0-9a-fA-F]{130}")
+# Addresses whose checksum form is remembered
+CHECKSUM_CACHE_SIZE = 4096
+
+
+def is_valid_address(address):
+    return isinstance(address, str) and ADDRESS_PATTERN.match(address) is not None
+
+
+def is_valid_hash(value):
+    return isinstance(value, str) and HASH_PATTERN.match(value) is not None
+
+
+def is_valid_call_id(call_id):
+    # A call identifier, like a proposal, is a 32 byte hash
+    return is_valid_hash(call_id)
+
+
+def is_valid_signature(signature):
+    return isinstance(signature, str) and len(signature) == 132 and SIGNATURE_BODY_PATTERN.fullmatch(signature, 2) is not None
+
+
+@lru_cache(maxsize=CHECKSUM_CACHE_SIZE)
+def checksum(address):
+    """Returns the EIP-55 checksum form of `address`, whatever the case it is written in."""
+    return to_checksum_address(address.lower())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Mide los modos de --add sobre una cadena sintetica de transacciones.
+
+Genera N transacciones entre M direcciones (algunas mucho mas activas que otras, como
+en una red real), las guarda en un cache temporal y compara:
+- incremental (memoria): un recorrido en orden de las transacciones ya cargadas.
+- incremental (SQLite): el mismo recorrido, leyendo todas las transacciones del cache.
+- indexed: el mismo resultado con `indexed_incremental`, que recorre el indice por
+  direccion con un heap mientras la clausura tenga pocas transacciones.
+- components: las dos pasadas de --all-transfers (union-find y lectura del cache).
+Tambien informa cuantas transacciones reportaba la version anterior de --add (todas).
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from closure import connected, incremental, indexed_incremental
+from transfer_cache import Transfer, TransferCache
+
+
+def synthetic_transfers(count, accounts, per_block, skew, seed):
+    rng = random.Random(seed)
+    addresses = [f"0x{rng.getrandbits(160):040x}" for _ in range(accounts)]
+    # Pesos con cola larga: pocas cuentas concentran muchas transacciones
+    weights = [1 / (rank + 1) ** skew for rank in range(accounts)]
+    senders = rng.choices(addresses, weights, k=count)
+    recipients = rng.choices(addresses, weights, k=count)
+    return addresses, [Transfer(n // per_block, sender, recipient, rng.randrange(1, 10 ** 21), os.urandom(32))
+                       for n, (sender, recipient) in enumerate(zip(senders, recipients))]
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transfers", help="Cantidad de transacciones", type=int, default=1_000_000)
+    parser.add_argument("--accounts", help="Cantidad de direcciones", type=int, default=200_000)
+    parser.add_argument("--per-block", help="Transacciones por bloque", type=int, default=10)
+    parser.add_argument("--skew", help="Exponente de la actividad segun el ranking de la cuenta (0: uniforme)", type=float, default=1.0)
+    parser.add_argument("--seeds", help="Direcciones buscadas, elegidas entre las menos activas", type=int, default=1)
+    parser.add_argument("--seed", help="Semilla del generador", type=int, default=1)
+    parser.add_argument("--start", help="Fraccion de la cadena en la que aparece la primera transaccion de las "
+                        "direcciones buscadas (0: la primera que encuentre)", type=float, default=0.0)
+    parser.add_argument("--max-fraction", help="max_fraction de indexed_incremental", type=float, default=None)
+    args = parser.parse_args()
+
+    addresses, transfers = synthetic_transfers(args.transfers, args.accounts, args.per_block, args.skew, args.seed)
+    last = transfers[-1].block
+    # Las direcciones buscadas se eligen entre las que aparecen recien despues de `start`
+    split = int(len(transfers) * args.start)
+    earlier = {address.lower() for transfer in transfers[:split] for address in (transfer.sender, transfer.recipient)}
+    candidates = sorted({transfer.sender.lower() for transfer in transfers[split:]} - earlier)
+    seeds = set(random.Random(args.seed).sample(candidates, args.seeds))
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = TransferCache(os.path.join(directory, "transfers.sqlite3"), bytes(32))
+        _, build = timed(lambda: cache.save(0, last, transfers))
+
+        expected, memory = timed(lambda: list(incremental(transfers, set(seeds))))
+        scanned, sequential = timed(lambda: list(incremental(cache.transfers(0, last), set(seeds))))
+        options = {} if args.max_fraction is None else {"max_fraction": args.max_fraction}
+        found, indexed = timed(lambda: list(indexed_incremental(cache, set(seeds), 0, last, **options)))
+        assert [t.hash for t in found] == [t.hash for t in expected] == [t.hash for t in scanned]
+
+        def components():
+            component = connected(cache.transfers(0, last), seeds)
+            return list(cache.transfers_of(component, 0, last))
+        reported, two_pass = timed(components)
+        cache.close()
+
+    print(f"Transacciones: {len(transfers)} en {last + 1} bloques, {len(addresses)} direcciones")
+    print(f"Cache e indice por direccion: {build:.2f} s")
+    print(f"--add anterior: {len(transfers)} transacciones reportadas")
+    print(f"incremental (memoria): {len(expected)} transacciones, {memory:.3f} s")
+    print(f"incremental (SQLite): {len(scanned)} transacciones, {sequential:.3f} s")
+    print(f"incremental (indice y heap): {len(found)} transacciones, {indexed:.3f} s")
+    print(f"--all-transfers (union-find y cache): {len(reported)} transacciones, {two_pass:.3f} s")
@@ -0,0 +1,124 @@
+"""Lectura concurrente de rangos de bloques.
+
+El rango se divide en tramos de bloques consecutivos que se piden al nodo desde un
+conjunto acotado de hilos, cada uno con su propia conexion. Los bloques se devuelven
+en orden, a medida que se completan los tramos.
+
+La cantidad de tramos en curso se ajusta con AIMD: crece de a uno mientras el nodo
+responde a buen ritmo y se reduce a la mitad cuando los bloques tardan mucho mas que
+los mas rapidos observados o cuando un pedido falla.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from web3 import Web3, IPCProvider, HTTPProvider
+from web3.middleware import geth_poa_middleware
+from web3.exceptions import BlockNotFound
+
+# Segundos de espera antes del primer reintento de un tramo; se duplica en cada reintento
+RETRY_DELAY = 0.5
+
+
+def connect(uri):
+    """Crea una instancia de Web3 para una red PoA, via HTTP o IPC segun la URI"""
+    if uri.startswith("http://") or uri.startswith("https://"):
+        provider = HTTPProvider(uri)
+    else:
+        provider = IPCProvider(uri)
+    w3 = Web3(provider)
+    w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+    return w3
+
+
+class AdaptiveConcurrency:
+    """Limite de tramos en curso, ajustado con incremento aditivo y reduccion multiplicativa.
+
+    :param initial: Limite inicial.
+    :param maximum: Limite maximo (la cantidad de hilos disponibles).
+    :param slowdown: Cuantas veces mas lento que el mejor tiempo por bloque observado
+        puede ser un tramo antes de reducir el limite.
+    """
+
+    def __init__(self, initial, maximum, slowdown=3.0):
+        self.maximum = maximum
+        self.limit = max(1, min(initial, maximum))
+        self.slowdown = slowdown
+        self.best = None
+        self.lock = threading.Lock()
+
+    def success(self, seconds_per_block):
+        with self.lock:
+            if self.best is None or seconds_per_block < self.best:
+                self.best = seconds_per_block
+            if seconds_per_block > self.best * self.slowdown:
+                self.limit = max(1, self.limit // 2)
+            else:
+                self.limit = min(self.maximum, self.limit + 1)
+
+    def failure(self):
+        with self.lock:
+            self.limit = max(1, self.limit // 2)
+
+
+class BlockScanner:
+    """Obtiene los bloques de un rango, con sus transacciones, usando varios hilos.
+
+    :param uri: URI del nodo (ruta del socket IPC o URL HTTP).
+    :param workers: Cantidad maxima de tramos pedidos a la vez.
+    :param chunk_size: Cantidad de bloques de cada tramo.
+    :param retries: Reintentos de un tramo que fallo, salvo que el bloque no exista.
+    """
+
+    def __init__(self, uri, workers=8, chunk_size=32, retries=3):
+        self.uri = uri
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.concurrency = AdaptiveConcurrency(max(1, workers // 2), workers)
+        self.local = threading.local()
+
+    def web3(self):
+        """Conexion del hilo actual; las conexiones IPC no se comparten entre hilos"""
+        w3 = getattr(self.local, "w3", None)
+        if w3 is None:
+            w3 = self.local.w3 = connect(self.uri)
+        return w3
+
+    def fetch_chunk(self, first, last):
+        """Obtiene los bloques first..last (incluidos), reintentando ante errores del nodo"""
+        for attempt in range(self.retries + 1):
+            start = time.monotonic()
+            try:
+                w3 = self.web3()
+                blocks = [w3.eth.get_block(n, full_transactions=True) for n in range(first, last + 1)]
+            except BlockNotFound:
+                raise
+            except Exception:
+                self.concurrency.failure()
+                if attempt == self.retries:
+                    raise
+                time.sleep(RETRY_DELAY * 2 ** attempt)
+                continue
+            self.concurrency.success((time.monotonic() - start) / len(blocks))
+            return blocks
+
+    def blocks(self, first, last):
+        """Genera los bloques first..last (incluidos) en orden.
+
+        Los errores de un tramo se lanzan recien al llegar a sus bloques, despues de
+        haber generado todos los anteriores.
+        """
+        pool = ThreadPoolExecutor(self.workers, thread_name_prefix="block-scanner")
+        pending = deque()
+        next_block = first
+        try:
+            while pending or next_block <= last:
+                while next_block <= last and len(pending) < self.concurrency.limit:
+                    chunk_last = min(last, next_block + self.chunk_size - 1)
+                    pending.append(pool.submit(self.fetch_chunk, next_block, chunk_last))
+                    next_block = chunk_last + 1
+                yield from pending.popleft().result()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
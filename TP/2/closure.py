@@ -0,0 +1,113 @@
+"""Clausura transitiva de las direcciones buscadas, usada por la opcion --add.
+
+Modo incremental (el de --add): se recorren las transacciones en orden y se informa cada
+una en la que interviene una direccion del conjunto; sus dos direcciones se agregan al
+conjunto desde ese momento. Las transacciones anteriores a que se agregue una direccion
+no se informan.
+
+Modo completo (--add --all-transfers): se informan todas las transacciones de las
+componentes conexas del grafo de transferencias que contienen a las direcciones
+buscadas, sin importar el orden en que ocurrieron. Requiere dos pasadas.
+
+Las direcciones se comparan en minusculas.
+"""
+import heapq
+
+from transfer_cache import MAX_INDEXED_FRACTION, involves
+
+
+def endpoints(transfer):
+    """Devuelve las direcciones en minusculas que intervienen en una transaccion"""
+    if transfer.recipient is None:
+        return (transfer.sender.lower(),)
+    return (transfer.sender.lower(), transfer.recipient.lower())
+
+
+def incremental(transfers, reached):
+    """Genera las transacciones de `transfers` (en orden) alcanzadas desde el conjunto
+    `reached`, que se va ampliando con las direcciones de cada una"""
+    for transfer in transfers:
+        if involves(transfer, reached):
+            reached.update(endpoints(transfer))
+            yield transfer
+
+
+def indexed_incremental(cache, reached, first, last, max_fraction=MAX_INDEXED_FRACTION):
+    """Igual que `incremental`, para los bloques first..last ya guardados en `cache`.
+
+    En lugar de recorrer todas las transacciones, mantiene un heap con las transacciones
+    de las direcciones alcanzadas, ordenadas por posicion (bloque, indice) y leidas junto
+    con el indice por direccion. Cuando se alcanza una direccion nueva, se agregan al heap
+    solo sus transacciones posteriores a la actual.
+
+    Si el heap llega a tener mas de `max_fraction` de las transacciones que se estima que
+    quedan por delante (segun los bloques restantes), porque la clausura alcanzo cuentas
+    muy activas, el resto se recorre en orden, que entonces es mas rapido.
+    """
+    total = cache.count(first, last)
+
+    def budget(block):
+        return int(total * (last - block + 1) / (last - first + 1) * max_fraction)
+
+    heap = []
+    for address in reached:
+        heap.extend(cache.address_transfers(address, first, last, limit=budget(first) - len(heap) + 1))
+        if len(heap) > budget(first):
+            break
+    heapq.heapify(heap)
+    previous = None
+    while heap:
+        if len(heap) > budget(heap[0][0]):
+            yield from incremental(cache.transfers(first, last, after=previous), reached)
+            return
+        block, position, transfer = heapq.heappop(heap)
+        # Una transaccion entre dos direcciones alcanzadas aparece dos veces seguidas
+        if (block, position) == previous:
+            continue
+        previous = (block, position)
+        yield transfer
+        for address in endpoints(transfer):
+            if address not in reached:
+                reached.add(address)
+                limit = budget(block) - len(heap) + 1
+                for entry in cache.address_transfers(address, first, last, after=previous, limit=max(1, limit)):
+                    heapq.heappush(heap, entry)
+
+
+class UnionFind:
+    """Conjuntos disjuntos de direcciones, con union por tamaño y compresion de caminos"""
+
+    def __init__(self):
+        self.parent = {}
+        self.size = {}
+
+    def find(self, item):
+        parent = self.parent
+        if item not in parent:
+            parent[item] = item
+            self.size[item] = 1
+            return item
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+
+def connected(transfers, addresses):
+    """Primera pasada del modo completo: devuelve las direcciones de las componentes
+    conexas de `transfers` que contienen a alguna de `addresses`"""
+    sets = UnionFind()
+    for transfer in transfers:
+        ends = endpoints(transfer)
+        sets.union(ends[0], ends[-1])
+    roots = {sets.find(address) for address in addresses}
+    return {address for address in sets.parent if sets.find(address) in roots} | set(addresses)
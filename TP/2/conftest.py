@@ -0,0 +1,22 @@
+"""Funciones y fixtures compartidas por los casos de prueba."""
+import os
+
+import pytest
+
+from transfer_cache import Transfer, TransferCache
+
+
+def transfer(block, sender, recipient, value=1):
+    return Transfer(block, sender, recipient, value, os.urandom(32))
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "transfers.sqlite3")
+
+
+@pytest.fixture
+def cache(path):
+    cache = TransferCache(path, bytes(32))
+    yield cache
+    cache.close()
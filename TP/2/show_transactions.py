@@ -11,7 +11,10 @@ en las que dichas direcciones son origen o destino.
 Si se especifica la opción add, cada vez que se encuentra una transacción que responde a
 los criterios de búsqueda, se agregan las cuentas intervinientes a la lista de direcciones
 a reportar.
+Con "--all-transfers", la opción add reporta además las transacciones de esas cuentas
+anteriores a que fueran agregadas (todas las de su componente conexa).
 La opción "--short" trunca las direcciones a los 8 primeros caracteres.
+Tambien se pueden pedir los formatos 'ndjson', 'csv' y 'parquet' (ver writers.py).
 La salida debe producirse en al menos los dos formatos siguientes:
 'plain': <origen> -> <destino>: <monto> (bloque)
 'graphviz': Debe producir un grafo representable por graphviz. Ejemplo (con opcion --short)
@@ -27,9 +30,11 @@ digraph Transfers {
 }
 """
 import argparse
-from web3 import Web3, IPCProvider
-from web3.middleware import geth_poa_middleware
 from web3.exceptions import BlockNotFound
+from block_scanner import BlockScanner, connect
+from transfer_cache import TransferCache, involves, scan
+from closure import connected, incremental, indexed_incremental
+from writers import FORMATS, open_writer
 
 def address(x):
     """Verifica si su argumento tiene forma de direccion ethereum valida"""
@@ -42,45 +47,74 @@ def address(x):
             pass
     raise argparse.ArgumentTypeError(f"Invalid address: '{x}'")
 
-def format_address(address, short):
-    """Formatea una direccion ethereum"""
-    if short:
-        return address[:10] + "..."
-    else:
-        return address
+def matching_transfers(scanner, cache, addresses, first, last, finalized, add=False, all_transfers=False):
+    """Genera, en orden, las transacciones a reportar de los bloques first..last"""
+    if not add:
+        yield from scan(scanner, cache, first, last, finalized, addresses)
+        return
+    if all_transfers:
+        # Primera pasada: componentes conexas de las direcciones; segunda: sus transacciones
+        if cache is None:
+            transfers = list(scan(scanner, None, first, last, finalized))
+            component = connected(transfers, addresses)
+            yield from (transfer for transfer in transfers if involves(transfer, component))
+        else:
+            component = connected(scan(scanner, cache, first, last, finalized), addresses)
+            yield from scan(scanner, cache, first, last, finalized, component)
+        return
+    reached = set(addresses)
+    if cache is not None and first <= min(last, finalized):
+        # Completa el cache hasta el ultimo bloque que puede guardarse y lo recorre con el indice por direccion
+        saved_last = min(last, finalized)
+        for start, stop, saved in cache.plan(first, saved_last):
+            if not saved:
+                for _ in scan(scanner, cache, start, stop, finalized):
+                    pass
+        yield from indexed_incremental(cache, reached, first, saved_last)
+        first = saved_last + 1
+    yield from incremental(scan(scanner, cache, first, last, finalized), reached)
 
 if __name__ == '__main__':
     DEFAULT_WEB3_URI = "~/blockchain-iua/devnet/node/geth.ipc"
     parser = argparse.ArgumentParser()
     parser.add_argument("addresses", metavar="ADDRESS", type=address, nargs='*', help="Direcciones a buscar")
     parser.add_argument("--add",help="Agrega las direcciones encontradas a la busqueda", action="store_true", default=False)
+    parser.add_argument("--all-transfers", help="Con --add, reporta tambien las transacciones anteriores a que se agregue una direccion", action="store_true")
     parser.add_argument("--first-block", "-f", help="Primer bloque del rango en el cual buscar", type=int, default=0)
     parser.add_argument("--last-block", "-l", help="Ultimo bloque del rango en el cual buscar", type=int, default="latest")
-    parser.add_argument("--format", help="Formato de salida", choices=["plain","graphviz"], default="plain")
-    parser.add_argument("--short", help="Trunca las direcciones a los 8 primeros caracteres", action="store_true")
+    parser.add_argument("--format", help="Formato de salida", choices=FORMATS, default="plain")
+    parser.add_argument("--output", "-o", help="Archivo de salida ('-' para la salida estandar)", default="-")
+    parser.add_argument("--short", help="Trunca las direcciones a los 8 primeros caracteres (formatos plain y graphviz)", action="store_true")
     parser.add_argument("--uri", help=f"URI para la conexion con geth",default=DEFAULT_WEB3_URI)
+    parser.add_argument("--workers", help="Cantidad maxima de tramos de bloques pedidos a la vez", type=int, default=8)
+    parser.add_argument("--chunk-size", help="Cantidad de bloques de cada tramo", type=int, default=32)
+    parser.add_argument("--cache", help="Archivo donde se guardan los bloques recorridos (vacio para no usarlo)", default="transfers.sqlite3")
+    parser.add_argument("--confirmations", help="Bloques que debe tener encima un bloque para guardarlo", type=int, default=12)
     args = parser.parse_args()
 
-    w3 = Web3(IPCProvider(args.uri))
-    w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+    w3 = connect(args.uri)
+    scanner = BlockScanner(args.uri, args.workers, args.chunk_size)
+    cache = None
+
+    # Las direcciones se comparan en minusculas
+    addresses = {address.lower() for address in args.addresses}
 
-    addresses = set(args.addresses)
-    
     try:
-        # Itero desde el primer bloque hasta (el ultimo bloque provisto por args (last_block) o el ultimo bloque existente)
-        for block_number in range(args.first_block, w3.eth.block_number + 1 if args.last_block == "latest" else (args.last_block + 1 if args.last_block < w3.eth.block_number else w3.eth.block_number + 1)):
-            block = w3.eth.get_block(block_number, full_transactions=True)
-            for transaction in block.transactions:
-                # Convierto el transaction['to'] a minusculas para que coincida con las direcciones en addresses
-                if transaction['to'].lower() in addresses or transaction['from'].lower() in addresses or args.add:
-                    if args.format == "plain":
-                        print(f"{format_address(transaction['from'], args.short)} -> {format_address(transaction['to'], args.short)}: {w3.from_wei(transaction['value'], 'ether')} ether (bloque {block_number})")
-                    elif args.format == "graphviz":
-                        print(f'"{format_address(transaction["from"], args.short)}" -> "{format_address(transaction["to"], args.short)}" [label="{w3.from_wei(transaction["value"], "ether")} ether (bloque {block_number})"]')
-                    if args.add:
-                        addresses.add(transaction['from'])
-                        addresses.add(transaction['to'])
+        if args.cache:
+            cache = TransferCache(args.cache, w3.eth.get_block(0).hash)
+        # Recorro desde el primer bloque hasta (el ultimo bloque provisto por args (last_block) o el ultimo bloque existente)
+        head = w3.eth.block_number
+        last_block = head if args.last_block == "latest" else min(args.last_block, head)
+        # Los bloques guardados en el cache se leen del archivo (con su indice por direccion);
+        # el resto se pide por tramos en paralelo, en orden. La salida se escribe por tandas
+        with open_writer(args.format, args.output, args.short) as writer:
+            for transfer in matching_transfers(scanner, cache, addresses, args.first_block, last_block,
+                                               head - args.confirmations, args.add, args.all_transfers):
+                writer.write(transfer)
     except BlockNotFound as e:
         print(f"Block not found: {e}")
     except Exception as e:
-        print(f"There was an error: {e}")
\ No newline at end of file
+        print(f"There was an error: {e}")
+    finally:
+        if cache is not None:
+            cache.close()
\ No newline at end of file
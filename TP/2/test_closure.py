@@ -0,0 +1,69 @@
+"""Casos de prueba de la clausura transitiva de --add (closure.py)."""
+import random
+
+import pytest
+
+from closure import UnionFind, connected, endpoints, incremental, indexed_incremental
+from conftest import transfer
+
+
+def random_transfers(count, accounts, seed):
+    rng = random.Random(seed)
+    addresses = [f"0x{n:040x}" for n in range(accounts)]
+    transfers = []
+    for n in range(count):
+        # Algunas creaciones de contratos, sin destino
+        recipient = None if rng.random() < 0.05 else rng.choice(addresses)
+        transfers.append(transfer(n // 3, rng.choice(addresses), recipient))
+    return addresses, transfers
+
+
+def test_union_find():
+    sets = UnionFind()
+    sets.union("a", "b")
+    sets.union("c", "d")
+    assert sets.find("a") == sets.find("b")
+    assert sets.find("a") != sets.find("c")
+    sets.union("b", "d")
+    assert len({sets.find(item) for item in "abcd"}) == 1
+    assert sets.find("e") == "e"
+
+
+def test_incremental_adds_addresses_from_then_on():
+    transfers = [
+        transfer(1, "0xb", "0xc"),  # anterior a que se alcance 0xb
+        transfer(2, "0xa", "0xb"),
+        transfer(3, "0xb", "0xc"),
+        transfer(4, "0xd", "0xe"),
+        transfer(5, "0xC", None),
+    ]
+    reached = {"0xa"}
+    assert list(incremental(transfers, reached)) == transfers[1:3] + transfers[4:]
+    assert reached == {"0xa", "0xb", "0xc"}
+
+
+def test_connected():
+    transfers = [transfer(1, "0xb", "0xc"), transfer(2, "0xa", "0xb"), transfer(3, "0xd", "0xe"), transfer(4, "0xf", None)]
+    assert connected(transfers, {"0xa"}) == {"0xa", "0xb", "0xc"}
+    assert connected(transfers, {"0xz"}) == {"0xz"}
+
+
+@pytest.mark.parametrize("max_fraction", [1.0, 0.05, 0.0])
+@pytest.mark.parametrize("seed", range(5))
+def test_indexed_incremental_matches_scan(cache, seed, max_fraction):
+    addresses, transfers = random_transfers(600, 150, seed)
+    last = transfers[-1].block
+    cache.save(0, last, transfers)
+    seeds = set(random.Random(seed).sample(addresses, 2))
+    for first in (0, last // 2):
+        selected = [t for t in transfers if t.block >= first]
+        expected = list(incremental(selected, set(seeds)))
+        reached = set(seeds)
+        found = list(indexed_incremental(cache, reached, first, last, max_fraction))
+        assert [t.hash for t in found] == [t.hash for t in expected]
+        assert reached == set(seeds).union(*(endpoints(t) for t in expected))
+
+
+def test_indexed_incremental_without_transfers(cache):
+    cache.save(0, 10, [])
+    assert list(indexed_incremental(cache, {"0xa"}, 0, 10)) == []
@@ -0,0 +1,90 @@
+"""Casos de prueba del cache de transacciones recorridas (transfer_cache.py)."""
+from conftest import transfer
+from transfer_cache import TransferCache, involves
+
+
+def test_plan_splits_saved_and_missing_ranges(cache):
+    cache.save(10, 19, [])
+    cache.save(30, 39, [])
+    assert cache.plan(0, 50) == [(0, 9, False), (10, 19, True), (20, 29, False), (30, 39, True), (40, 50, False)]
+    assert cache.plan(12, 15) == [(12, 15, True)]
+    assert cache.plan(20, 29) == [(20, 29, False)]
+
+
+def test_save_merges_overlapping_and_contiguous_ranges(cache):
+    cache.save(10, 19, [])
+    cache.save(20, 29, [])
+    assert cache.covered(0, 100) == [(10, 29)]
+    cache.save(25, 40, [])
+    cache.save(50, 60, [])
+    assert cache.covered(0, 100) == [(10, 40), (50, 60)]
+    cache.save(0, 100, [])
+    assert cache.covered(0, 100) == [(0, 100)]
+
+
+def test_save_replaces_transfers_of_a_saved_range(cache):
+    first = [transfer(1, "0xA", "0xB", 5), transfer(1, "0xB", None, 7), transfer(2, "0xC", "0xA", 10 ** 30)]
+    cache.save(1, 2, first)
+    assert list(cache.transfers(1, 2)) == first
+    second = [transfer(1, "0xD", "0xE")]
+    cache.save(1, 2, second)
+    assert list(cache.transfers(1, 2)) == second
+    assert cache.count(1, 2) == 1
+
+
+def test_transfers_after_position(cache):
+    transfers = [transfer(1, "0xa", "0xb"), transfer(1, "0xb", "0xc"), transfer(2, "0xc", "0xd")]
+    cache.save(1, 2, transfers)
+    assert list(cache.transfers(1, 2, after=(1, 0))) == transfers[1:]
+
+
+def test_transfers_of_matches_filter(cache):
+    transfers = [transfer(n // 4, f"0x{n % 7:040x}", None if n % 5 == 0 else f"0x{n % 11:040x}") for n in range(200)]
+    cache.save(0, 49, transfers)
+    for addresses in ({f"0x{1:040x}"}, {f"0x{n:040x}" for n in range(7)}, {"0x" + "f" * 40}):
+        expected = [t for t in transfers if involves(t, addresses)]
+        assert list(cache.transfers_of(addresses, 0, 49)) == expected
+
+
+def test_address_transfers(cache):
+    transfers = [transfer(1, "0xA", "0xb"), transfer(2, "0xc", "0xa"), transfer(3, "0xa", None)]
+    cache.save(1, 3, transfers)
+    assert [entry[2] for entry in cache.address_transfers("0xa", 1, 3)] == [transfers[0], transfers[1], transfers[2]]
+    assert [entry[:2] for entry in cache.address_transfers("0xa", 1, 3, after=(1, 0))] == [(2, 0), (3, 0)]
+    assert len(cache.address_transfers("0xa", 1, 3, limit=1)) == 1
+
+
+def test_save_replaces_postings_of_a_saved_range_only(cache):
+    kept = transfer(1, "0xa", "0xb")
+    cache.save(1, 1, [kept])
+    cache.save(2, 3, [transfer(2, "0xa", "0xc")])
+    cache.save(2, 3, [transfer(3, "0xd", "0xe")])
+    assert list(cache.transfers_of({"0xa"}, 1, 3)) == [kept]
+    assert list(cache.transfers_of({"0xc"}, 1, 3)) == []
+    assert cache.count_postings({"0xa", "0xd"}, 1, 3, limit=10) == 2
+
+
+def test_postings_are_built_for_a_cache_without_them(path):
+    transfers = [transfer(1, "0xA", "0xb"), transfer(2, "0xb", None)]
+    cache = TransferCache(path, bytes(32))
+    cache.save(1, 2, transfers)
+    with cache.db:
+        cache.db.execute("DELETE FROM postings")
+    cache.close()
+    cache = TransferCache(path, bytes(32))
+    assert list(cache.transfers_of({"0xb"}, 1, 2)) == transfers
+    assert [entry[2] for entry in cache.address_transfers("0xa", 1, 2)] == transfers[:1]
+    cache.close()
+
+
+def test_other_genesis_discards_the_cache(path):
+    cache = TransferCache(path, bytes(32))
+    cache.save(0, 9, [transfer(1, "0xa", "0xb")])
+    cache.close()
+    cache = TransferCache(path, bytes(32))
+    assert cache.covered(0, 9) == [(0, 9)]
+    cache.close()
+    cache = TransferCache(path, b"\x01" * 32)
+    assert cache.covered(0, 9) == []
+    assert list(cache.transfers(0, 9)) == []
+    cache.close()
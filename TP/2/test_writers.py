@@ -0,0 +1,56 @@
+"""Casos de prueba de la escritura de transacciones (writers.py)."""
+import io
+import random
+
+import pytest
+
+from transfer_cache import Transfer
+from writers import CONTRACT_CREATION, GraphvizWriter, PlainWriter, ether, ether_many
+
+
+@pytest.mark.parametrize("value, expected", [
+    (0, "0"),
+    (1, "1E-18"),
+    (10 ** 9, "1E-9"),
+    (10 ** 18, "1"),
+    (2000 * 10 ** 18, "2000"),
+    (1234567890123456789, "1.234567890123456789"),
+])
+def test_ether(value, expected):
+    assert ether(value) == expected
+
+
+def test_ether_matches_from_wei():
+    web3 = pytest.importorskip("web3")
+    rng = random.Random(1)
+    values = [0, 1, 10, 10 ** 18, 10 ** 21, 10 ** 40] + [rng.randrange(10 ** rng.randrange(1, 40)) for _ in range(2000)]
+    for value in values:
+        assert ether(value) == str(web3.Web3.from_wei(value, "ether"))
+
+
+def test_ether_many():
+    assert ether_many([10 ** 18, 0, 10 ** 18]) == ["1", "0", "1"]
+
+
+def test_plain_writer_flushes_by_batches():
+    stream = io.StringIO()
+    transfers = [Transfer(n, "0xa", "0xb", 10 ** 18, bytes(32)) for n in range(5)]
+    with PlainWriter(stream, batch_size=2) as writer:
+        for transfer in transfers[:3]:
+            writer.write(transfer)
+        assert stream.getvalue().count("\n") == 2
+        writer.write(transfers[3])
+    assert stream.getvalue().splitlines() == [f"0xa -> 0xb: 1 ether (bloque {n})" for n in range(4)]
+
+
+@pytest.mark.parametrize("short", [False, True])
+def test_contract_creation_has_a_marker_as_recipient(short):
+    transfer = Transfer(7, "0x" + "a" * 40, None, 0, bytes(32))
+    plain, graphviz = io.StringIO(), io.StringIO()
+    with PlainWriter(plain, short) as writer:
+        writer.write(transfer)
+    with GraphvizWriter(graphviz, short) as writer:
+        writer.write(transfer)
+    assert f"-> {CONTRACT_CREATION}: 0 ether (bloque 7)" in plain.getvalue()
+    assert f'-> "{CONTRACT_CREATION}"' in graphviz.getvalue()
+    assert "None" not in plain.getvalue() + graphviz.getvalue()
@@ -0,0 +1,251 @@
+"""Cache local de las transacciones de los bloques ya recorridos.
+
+Guarda, en un archivo SQLite, las transacciones de cada bloque (bloque, origen, destino,
+monto y hash) junto con los rangos de bloques ya recorridos. Las ejecuciones siguientes
+leen esos rangos del archivo y solo piden al nodo los bloques que faltan. Los bloques se
+guardan por tandas a medida que se recorren, asi que un recorrido interrumpido continua
+desde la ultima tanda guardada.
+
+Cada transaccion guardada se indexa por su origen y su destino (en minusculas), de modo
+que buscar las transacciones de pocas direcciones en un rango guardado es una consulta
+al indice y no un recorrido de todas las transacciones.
+
+Solo se guardan bloques con suficientes confirmaciones, que ya no pueden cambiar. Si el bloque genesis del nodo no coincide con el del archivo, se descarta todo.
+"""
+import sqlite3
+from collections import namedtuple
+
+# Bloques recorridos que se acumulan antes de guardarlos en el archivo
+CHECKPOINT_BLOCKS = 1000
+# Fraccion de las transacciones de un rango a partir de la cual leerlas todas en orden es mas
+# rapido que buscar las de algunas direcciones en el indice (ver bench_closure.py)
+MAX_INDEXED_FRACTION = 0.05
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS transfers (
+    block INTEGER,
+    position INTEGER,
+    sender TEXT,
+    recipient TEXT,
+    value TEXT,
+    hash BLOB,
+    PRIMARY KEY (block, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS ranges (first INTEGER PRIMARY KEY, last INTEGER);
+CREATE TABLE IF NOT EXISTS postings (
+    address TEXT,
+    block INTEGER,
+    position INTEGER,
+    PRIMARY KEY (address, block, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_block ON postings (block, position);
+"""
+
+Transfer = namedtuple("Transfer", ["block", "sender", "recipient", "value", "hash"])
+
+
+def involves(transfer, addresses):
+    """Indica si el origen o el destino de la transaccion, en minusculas, esta en addresses"""
+    return transfer.sender.lower() in addresses or (transfer.recipient or "").lower() in addresses
+
+
+def block_transfers(block):
+    """Devuelve las transacciones de un bloque obtenido con full_transactions=True"""
+    return [Transfer(block.number, tx["from"], tx["to"], tx["value"], bytes(tx["hash"])) for tx in block.transactions]
+
+
+class TransferCache:
+    """Transacciones y rangos de bloques recorridos, guardados en `path`.
+
+    :param path: Ruta del archivo SQLite.
+    :param genesis: Hash del bloque 0 del nodo, para detectar que se trata de otra red.
+    """
+
+    def __init__(self, path, genesis):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        with self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.executescript(SCHEMA)
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'genesis'").fetchone()
+        if row is None or row[0] != bytes(genesis).hex():
+            self.clear()
+            with self.db:
+                self.db.execute("INSERT OR REPLACE INTO meta VALUES ('genesis', ?)", (bytes(genesis).hex(),))
+        self.build_postings()
+
+    def build_postings(self):
+        """Indexa por direccion las transacciones guardadas por versiones que no tenian el indice"""
+        if self.db.execute("SELECT 1 FROM postings LIMIT 1").fetchone() is not None:
+            return
+        with self.db:
+            self.db.execute("INSERT OR IGNORE INTO postings SELECT lower(sender), block, position FROM transfers")
+            self.db.execute("INSERT OR IGNORE INTO postings SELECT lower(recipient), block, position FROM transfers "
+                            "WHERE recipient IS NOT NULL")
+
+    def clear(self):
+        with self.db:
+            self.db.execute("DELETE FROM transfers")
+            self.db.execute("DELETE FROM postings")
+            self.db.execute("DELETE FROM ranges")
+
+    def covered(self, first, last):
+        """Devuelve los rangos guardados que se superponen con first..last, recortados y ordenados"""
+        rows = self.db.execute(
+            "SELECT first, last FROM ranges WHERE last >= ? AND first <= ? ORDER BY first", (first, last))
+        return [(max(start, first), min(stop, last)) for start, stop in rows]
+
+    def plan(self, first, last):
+        """Divide first..last en tramos (inicio, fin, guardado), en orden"""
+        segments = []
+        position = first
+        for start, stop in self.covered(first, last):
+            if position < start:
+                segments.append((position, start - 1, False))
+            segments.append((start, stop, True))
+            position = stop + 1
+        if position <= last:
+            segments.append((position, last, False))
+        return segments
+
+    def transfers(self, first, last, after=None):
+        """Genera las transacciones guardadas de los bloques first..last, en orden, posteriores
+        a la posicion (bloque, indice) `after` si se da"""
+        if after is None:
+            rows = self.db.execute(
+                "SELECT block, sender, recipient, value, hash FROM transfers "
+                "WHERE block BETWEEN ? AND ? ORDER BY block, position", (first, last))
+        else:
+            rows = self.db.execute(
+                "SELECT block, sender, recipient, value, hash FROM transfers "
+                "WHERE block BETWEEN ? AND ? AND (block, position) > (?, ?) ORDER BY block, position", (first, last, *after))
+        for block, sender, recipient, value, tx_hash in rows:
+            yield Transfer(block, sender, recipient, int(value), tx_hash)
+
+    def count(self, first, last):
+        """Devuelve la cantidad de transacciones guardadas de los bloques first..last"""
+        return self.db.execute("SELECT COUNT(*) FROM transfers WHERE block BETWEEN ? AND ?", (first, last)).fetchone()[0]
+
+    def count_postings(self, addresses, first, last, limit):
+        """Cuenta las posiciones del indice de las direcciones en los bloques first..last; deja
+        de contar al superar `limit`"""
+        total = 0
+        for address in addresses:
+            total += self.db.execute("SELECT COUNT(*) FROM postings WHERE address = ? AND block BETWEEN ? AND ?",
+                                     (address, first, last)).fetchone()[0]
+            if total > limit:
+                break
+        return total
+
+    def transfers_of(self, addresses, first, last):
+        """Genera, en orden, las transacciones guardadas de los bloques first..last que involucran
+        a alguna de las direcciones (en minusculas), usando el indice por direccion. Si las
+        direcciones tienen mas de MAX_INDEXED_FRACTION de las transacciones del rango, las
+        recorre todas en orden"""
+        limit = int(self.count(first, last) * MAX_INDEXED_FRACTION)
+        if self.count_postings(addresses, first, last, limit) > limit:
+            yield from (transfer for transfer in self.transfers(first, last) if involves(transfer, addresses))
+            return
+        # Las direcciones van en una tabla temporal, porque pueden ser mas que los parametros de una consulta
+        with self.db:
+            self.db.execute("CREATE TEMP TABLE IF NOT EXISTS query_addresses (address TEXT PRIMARY KEY)")
+            self.db.execute("DELETE FROM query_addresses")
+            self.db.executemany("INSERT OR IGNORE INTO query_addresses VALUES (?)", ((address,) for address in addresses))
+        rows = self.db.execute(
+            "SELECT block, sender, recipient, value, hash FROM transfers WHERE (block, position) IN ("
+            "SELECT block, position FROM postings WHERE address IN (SELECT address FROM query_addresses) "
+            "AND block BETWEEN ? AND ?) ORDER BY block, position", (first, last))
+        for block, sender, recipient, value, tx_hash in rows:
+            yield Transfer(block, sender, recipient, int(value), tx_hash)
+
+    def address_transfers(self, address, first, last, after=None, limit=-1):
+        """Devuelve, como tuplas (bloque, indice, transaccion), hasta `limit` transacciones guardadas
+        de una direccion (en minusculas) en los bloques first..last, posteriores a la posicion
+        `after` si se da. Las transacciones se leen junto con el indice, en una sola consulta"""
+        if after is None:
+            condition, params = "p.block BETWEEN ? AND ?", (first, last)
+        else:
+            condition, params = "(p.block, p.position) > (?, ?) AND p.block <= ?", (*after, last)
+        rows = self.db.execute(
+            "SELECT p.block, p.position, t.sender, t.recipient, t.value, t.hash FROM postings p "
+            "JOIN transfers t ON t.block = p.block AND t.position = p.position "
+            f"WHERE p.address = ? AND {condition} ORDER BY p.block, p.position LIMIT ?", (address, *params, limit))
+        return [(block, position, Transfer(block, sender, recipient, int(value), tx_hash))
+                for block, position, sender, recipient, value, tx_hash in rows]
+
+    def save(self, first, last, transfers):
+        """Guarda las transacciones de los bloques first..last y marca el rango como recorrido"""
+        positions = {}
+        rows = []
+        postings = set()
+        for transfer in transfers:
+            position = positions[transfer.block] = positions.get(transfer.block, -1) + 1
+            rows.append((transfer.block, position, transfer.sender, transfer.recipient, str(transfer.value), transfer.hash))
+            postings.add((transfer.sender.lower(), transfer.block, position))
+            if transfer.recipient is not None:
+                postings.add((transfer.recipient.lower(), transfer.block, position))
+        with self.db:
+            # Solo un rango ya guardado puede tener transacciones que reemplazar
+            if self.covered(first, last):
+                self.db.execute("DELETE FROM transfers WHERE block BETWEEN ? AND ?", (first, last))
+                self.db.execute("DELETE FROM postings WHERE block BETWEEN ? AND ?", (first, last))
+            self.db.executemany("INSERT INTO transfers VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.db.executemany("INSERT INTO postings VALUES (?, ?, ?)", postings)
+            # Une el rango nuevo con los que se superponen o son contiguos
+            merged = self.db.execute(
+                "SELECT MIN(first), MAX(last) FROM ranges WHERE last >= ? AND first <= ?", (first - 1, last + 1)).fetchone()
+            start = first if merged[0] is None else min(first, merged[0])
+            stop = last if merged[1] is None else max(last, merged[1])
+            self.db.execute("DELETE FROM ranges WHERE last >= ? AND first <= ?", (first - 1, last + 1))
+            self.db.execute("INSERT INTO ranges VALUES (?, ?)", (start, stop))
+
+    def close(self):
+        self.db.close()
+
+
+def scan(scanner, cache, first, last, finalized, addresses=None):
+    """Genera, en orden, las transacciones de los bloques first..last.
+
+    Los rangos guardados en `cache` se leen del archivo y el resto se pide al nodo con
+    `scanner`. De lo pedido al nodo se guardan, cada CHECKPOINT_BLOCKS bloques, los
+    bloques hasta `finalized`. Sin `cache` se pide todo al nodo.
+
+    Si se dan `addresses` (en minusculas), solo se generan las transacciones que las
+    involucran; en los rangos guardados se buscan con el indice por direccion.
+    """
+    if cache is None:
+        for block in scanner.blocks(first, last):
+            for transfer in block_transfers(block):
+                if addresses is None or involves(transfer, addresses):
+                    yield transfer
+        return
+    for start, stop, saved in cache.plan(first, last):
+        if saved:
+            if addresses is None:
+                yield from cache.transfers(start, stop)
+            else:
+                yield from cache.transfers_of(addresses, start, stop)
+            continue
+        pending = []
+        pending_first = start
+        # Ultimo bloque recorrido que puede guardarse
+        fetched = start - 1
+        try:
+            for block in scanner.blocks(start, stop):
+                transfers = block_transfers(block)
+                if block.number <= finalized:
+                    pending.extend(transfers)
+                    fetched = block.number
+                    if fetched - pending_first + 1 >= CHECKPOINT_BLOCKS:
+                        cache.save(pending_first, fetched, pending)
+                        pending = []
+                        pending_first = fetched + 1
+                if addresses is None:
+                    yield from transfers
+                else:
+                    yield from (transfer for transfer in transfers if involves(transfer, addresses))
+        finally:
+            # Guarda lo recorrido aunque el recorrido se interrumpa
+            if fetched >= pending_first:
+                cache.save(pending_first, fetched, pending)
@@ -0,0 +1,201 @@
+"""Escritura de las transacciones encontradas en distintos formatos.
+
+Las transacciones se acumulan y se escriben por tandas, en lugar de una llamada a print
+por linea. Los montos se mantienen en wei (enteros) hasta el momento de escribirlos; la
+conversion a ether se hace por tanda, una sola vez por cada monto distinto.
+
+Formatos:
+'plain' y 'graphviz': las mismas lineas que producia show_transactions.py.
+'ndjson': un objeto JSON por linea, con el monto en wei como entero.
+'csv': una fila por transaccion, con encabezado y el monto en wei.
+'parquet': archivo columnar para analisis posteriores; requiere pyarrow y --output.
+"""
+import csv
+import json
+import sys
+from decimal import Decimal, localcontext
+from functools import lru_cache
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Transacciones acumuladas antes de escribirlas
+BATCH_SIZE = 4096
+FORMATS = ["plain", "graphviz", "ndjson", "csv", "parquet"]
+# Destino que se muestra en las transacciones que crean un contrato, que no tienen destino
+CONTRACT_CREATION = "(nuevo contrato)"
+
+
+def format_address(address, short):
+    """Formatea una direccion ethereum"""
+    if address is None:
+        return CONTRACT_CREATION
+    if short:
+        return address[:10] + "..."
+    else:
+        return address
+
+
+@lru_cache(maxsize=65536)
+def ether(value):
+    """Convierte un monto en wei a ether, con el mismo texto que str(w3.from_wei(value, 'ether'))"""
+    if value == 0:
+        return "0"
+    with localcontext() as ctx:
+        ctx.prec = 999
+        amount = Decimal(value).scaleb(-18).normalize()
+        # from_wei no usa notacion cientifica para montos enteros (2000 y no 2E+3)
+        if amount.as_tuple().exponent > 0:
+            amount = amount.quantize(Decimal(1))
+    return str(amount)
+
+
+def ether_many(values):
+    """Convierte una tanda de montos en wei a ether, una vez por cada monto distinto"""
+    converted = {value: ether(value) for value in set(values)}
+    return [converted[value] for value in values]
+
+
+class Writer:
+    """Acumula transacciones y las escribe por tandas de `batch_size` en `stream`, que se
+    cierra al terminar si `close` es verdadero"""
+
+    def __init__(self, stream, short=False, batch_size=BATCH_SIZE, close=False):
+        self.stream = stream
+        self.close = close
+        self.short = short
+        self.batch_size = batch_size
+        self.batch = []
+
+    def __enter__(self):
+        self.begin()
+        return self
+
+    def __exit__(self, *exc):
+        # Tambien se escribe lo acumulado si el recorrido termina con un error
+        self.flush()
+        self.end()
+
+    def begin(self):
+        pass
+
+    def end(self):
+        self.stream.flush()
+        if self.close:
+            self.stream.close()
+
+    def write(self, transfer):
+        self.batch.append(transfer)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            self.write_batch(self.batch)
+            self.batch = []
+
+    def write_batch(self, transfers):
+        raise NotImplementedError
+
+
+class PlainWriter(Writer):
+    """<origen> -> <destino>: <monto> ether (bloque <numero>)"""
+
+    def write_batch(self, transfers):
+        amounts = ether_many([transfer.value for transfer in transfers])
+        self.stream.write("".join(
+            f"{format_address(t.sender, self.short)} -> {format_address(t.recipient, self.short)}: {amount} ether (bloque {t.block})\n"
+            for t, amount in zip(transfers, amounts)))
+
+
+class GraphvizWriter(Writer):
+    """Aristas de graphviz: "<origen>" -> "<destino>" [label="<monto> ether (bloque <numero>)"]"""
+
+    def write_batch(self, transfers):
+        amounts = ether_many([transfer.value for transfer in transfers])
+        self.stream.write("".join(
+            f'"{format_address(t.sender, self.short)}" -> "{format_address(t.recipient, self.short)}" [label="{amount} ether (bloque {t.block})"]\n'
+            for t, amount in zip(transfers, amounts)))
+
+
+def record(transfer):
+    return {
+        "block": transfer.block,
+        "from": transfer.sender,
+        "to": transfer.recipient,
+        "value": transfer.value,
+        "hash": "0x" + transfer.hash.hex(),
+    }
+
+
+class NDJSONWriter(Writer):
+    """Un objeto JSON por transaccion, con el monto en wei"""
+
+    def write_batch(self, transfers):
+        self.stream.write("".join(json.dumps(record(transfer)) + "\n" for transfer in transfers))
+
+
+class CSVWriter(Writer):
+    """Una fila por transaccion (block,from,to,value,hash), con el monto en wei"""
+
+    def begin(self):
+        self.csv = csv.writer(self.stream, lineterminator="\n")
+        self.csv.writerow(["block", "from", "to", "value", "hash"])
+
+    def write_batch(self, transfers):
+        self.csv.writerows((t.block, t.sender, t.recipient, t.value, "0x" + t.hash.hex()) for t in transfers)
+
+
+class ParquetWriter(Writer):
+    """Archivo Parquet con una columna por campo. El monto en wei se guarda como texto, porque
+    puede superar la precision de los tipos numericos de Parquet"""
+
+    def __init__(self, path, short=False, batch_size=BATCH_SIZE * 16):
+        if pyarrow is None:
+            raise RuntimeError("The parquet format requires pyarrow (pip install pyarrow)")
+        super().__init__(None, short, batch_size)
+        self.path = path
+        self.schema = pyarrow.schema([
+            ("block", pyarrow.int64()),
+            ("from", pyarrow.string()),
+            ("to", pyarrow.string()),
+            ("value", pyarrow.string()),
+            ("hash", pyarrow.binary(32)),
+        ])
+
+    def begin(self):
+        self.parquet = pyarrow.parquet.ParquetWriter(self.path, self.schema)
+
+    def end(self):
+        self.parquet.close()
+
+    def write_batch(self, transfers):
+        self.parquet.write_table(pyarrow.table({
+            "block": [t.block for t in transfers],
+            "from": [t.sender for t in transfers],
+            "to": [t.recipient for t in transfers],
+            "value": [str(t.value) for t in transfers],
+            "hash": [t.hash for t in transfers],
+        }, schema=self.schema))
+
+
+WRITERS = {
+    "plain": PlainWriter,
+    "graphviz": GraphvizWriter,
+    "ndjson": NDJSONWriter,
+    "csv": CSVWriter,
+}
+
+
+def open_writer(format, output="-", short=False):
+    """Crea el writer de un formato, que escribe en el archivo `output` o en la salida estandar ("-")"""
+    if format == "parquet":
+        if output == "-":
+            raise ValueError("The parquet format needs a file (--output)")
+        return ParquetWriter(output, short)
+    if output == "-":
+        return WRITERS[format](sys.stdout, short)
+    return WRITERS[format](open(output, "w", newline=""), short, close=True)
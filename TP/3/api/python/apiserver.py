@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 """Maqueta de servidor de API REST para el Trabajo Práctico 2"""
 import os
-import re
 from os import listdir
 from hashlib import sha256
 from web3 import Web3, IPCProvider
@@ -13,9 +12,14 @@ import json
 
 from flask import Flask, jsonify, request
 
+# La validación de hashes se comparte con el servidor del trabajo final
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), "../../../../Final"))
+from validation import is_valid_hash
+from receipts import ReceiptPoller
+
 app = Flask(__name__)
 
-HASH_PATTERN = re.compile(r"0x[0-9a-fA-F]{64}")
+RECEIPT_TIMEOUT = 120
 
 # Me conecto a la red Ethereum de bfatest
 try:
@@ -35,9 +39,8 @@ with open('Stamper.json') as f:
 # Se crea la instancia del contrato con los datos leidos
 contract = web3.eth.contract(address=address, abi=abi)
 
-def is_valid_hash(string):
-    """Valida que el string sea un hash válido"""
-    return re.match(HASH_PATTERN, string)
+# Sigue las transacciones enviadas hasta que se minan, desde un único hilo
+receipt_poller = ReceiptPoller(web3)
 
 def is_valid_signature(signature, hash):
     """Valida que la firma sea válida"""
@@ -156,15 +159,23 @@ def stamp():
                 # Ya con la transaction armada, firmo y envio
                 signed_transaction = web3.eth.account.sign_transaction(transaction, private_key = private_key)
                 transaction_hash = web3.eth.send_raw_transaction(signed_transaction.rawTransaction)
-                tx = web3.eth.get_transaction(transaction_hash)
-                transaction_receipt = web3.eth.wait_for_transaction_receipt(transaction_hash)
-                
-                if (transaction_receipt.status != 1):
+                job = receipt_poller.track(tx_hash=transaction_hash)
+
+                if respond_async():
+                    # No se espera a que se mine: el cliente consulta /jobs/<jobId>
+                    response = jsonify(transaction=transaction_hash.hex(), jobId=job.id)
+                    response.status_code = 202
+                    response.headers["Location"] = f"/jobs/{job.id}"
+                    return response
+
+                if not job.wait(RECEIPT_TIMEOUT):
+                    raise StamperException("Transaction was not mined in time")
+                if (job.status != "mined"):
                     # La transaccion fallo
                     raise StamperException("Transaction failed")
                 else:
                     # La transaccion salio todo bien
-                    jsonn = {'transaction':str(transaction_hash.hex()),'blockNumber':transaction_receipt.get("blockNumber")}
+                    jsonn = {'transaction':str(transaction_hash.hex()),'blockNumber':job.block_number}
                     response = jsonify(jsonn)
                     response.status_code = 201
                     response.headers["Content-Type"] = "application/json; charset=utf-8"
@@ -179,6 +190,25 @@ def stamp():
     return response
 
 
+@app.get("/jobs/<job_id>")
+def job_status(job_id):
+    """Devuelve el estado de un sellado asincrónico: pending, mined o reverted"""
+    job = receipt_poller.get(job_id)
+    if job is None:
+        response = jsonify(message="Job not found")
+        response.status_code = 404
+        return response
+    return jsonify(job.to_json())
+
+
+def respond_async():
+    """Indica si el cliente pidió no esperar a que se mine la transacción,
+    con `?async=true` o `Prefer: respond-async`"""
+    if "async" in request.args:
+        return request.args["async"].lower() in ("1", "true", "yes")
+    return "respond-async" in request.headers.get("Prefer", "")
+
+
 if __name__ == '__main__':
     keystore_dir = os.path.expanduser("~/Library/ethereum/keystore")
     keystore = list(map(lambda f: os.path.join(
@@ -202,4 +232,5 @@ if __name__ == '__main__':
         sys.exit(1)
         
     stamper = Stamper(sender)
+    receipt_poller.start()
     app.run(debug=False)
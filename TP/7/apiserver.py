@@ -1,5 +1,6 @@
 import argparse
-import re
+import os
+import sys
 import json
 import messages
 from web3 import Web3, HTTPProvider
@@ -12,6 +13,10 @@ from flask import make_response
 import argparse
 from flask_cors import CORS, cross_origin
 
+# Input validation is shared with the final version of the server
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), "../../Final"))
+from validation import checksum, is_valid_address, is_valid_call_id, is_valid_signature
+
 
 empty = "0x0000000000000000000000000000000000000000"
 parser = argparse.ArgumentParser()
@@ -73,7 +78,7 @@ def create():
     closing_time = data['closingTime']
     signature = data['signature']
     
-    if not (all(c in "0123456789abcdefABCDEF" for c in signature[2:]) and len(signature[2:]) == 130):
+    if not is_valid_signature(signature):
         return jsonify({'message': messages.INVALID_SIGNATURE}), 400, {"Content-Type": "application/json"}
     
     if not is_valid_call_id(call_id):
@@ -87,7 +92,7 @@ def create():
     
     message_bytes = w3.to_bytes(hexstr=cfp_address[2:] + call_id[2:])
     owner_address = w3.eth.account.recover_message(encode_defunct(message_bytes), signature=signature)
-    owner_is_authorized = cfp_factory_contract.functions.isAuthorized(w3.to_checksum_address(owner_address.lower())).call()
+    owner_is_authorized = cfp_factory_contract.functions.isAuthorized(checksum(owner_address)).call()
     
     if not owner_is_authorized:
         return jsonify({'message': messages.UNAUTHORIZED}), 403, {"Content-Type": "application/json"}
@@ -126,24 +131,24 @@ def register():
     if not is_valid_address(address):
         return jsonify({"message": messages.INVALID_ADDRESS}), 400, {"Content-Type": "application/json"}
 
-    if not (all(c in "0123456789abcdefABCDEF" for c in signature[2:]) and len(signature[2:])==130):
+    if not is_valid_signature(signature):
         return jsonify({"message": messages.INVALID_SIGNATURE}), 400, {"Content-Type": "application/json"}
     
     contract_address_bytes = w3.to_bytes(hexstr = cfp_address[2:])
     encoder = encode_defunct(contract_address_bytes)
     addressRecovered = w3.eth.account.recover_message(encoder, signature=signature)
-    address = w3.to_checksum_address(address.lower())
+    address = checksum(address)
    
     
     if addressRecovered != address:
         return jsonify({"message": messages.INVALID_SIGNATURE}), 400, {"Content-Type": "application/json"}
 
-    is_authorized = cfp_factory_contract.functions.isAuthorized(w3.to_checksum_address(address.lower())).call()
+    is_authorized = cfp_factory_contract.functions.isAuthorized(checksum(address)).call()
     if is_authorized:
         return jsonify({"message": messages.ALREADY_AUTHORIZED}), 403, {"Content-Type": "application/json"}
 
     try:
-        cfp_factory_contract.functions.authorize(w3.to_checksum_address(address)).transact({"from": owner.address})
+        cfp_factory_contract.functions.authorize(checksum(address)).transact({"from": owner.address})
     except Exception as e:
         return jsonify({"message": messages.INTERNAL_ERROR}), 500, {"Content-Type": "application/json"}
 
@@ -202,7 +207,7 @@ def authorized(address):
         if not is_valid_address(address):
                 return make_response(jsonify({"message": messages.INVALID_ADDRESS}), 400)
         
-        response_body = cfp_factory_contract.functions.isAuthorized(w3.to_checksum_address(address)).call()
+        response_body = cfp_factory_contract.functions.isAuthorized(checksum(address)).call()
         
         return make_response(jsonify({"authorized": response_body}), 200)
 
@@ -211,12 +216,12 @@ def authorize(address):
         if not is_valid_address(address):
                 return make_response(jsonify({"message": messages.INVALID_ADDRESS}), 400)
         
-        is_authorized = cfp_factory_contract.functions.isAuthorized(w3.to_checksum_address(address)).call()
+        is_authorized = cfp_factory_contract.functions.isAuthorized(checksum(address)).call()
         if is_authorized:
                 return make_response(jsonify({"message": messages.ALREADY_AUTHORIZED}), 403)
         
         try:
-                cfp_factory_contract.functions.authorize(w3.to_checksum_address(address)).transact({"from": owner.address})
+                cfp_factory_contract.functions.authorize(checksum(address)).transact({"from": owner.address})
         except Exception as e:
                 return make_response(jsonify({"message": str(e)}), 500)
         
@@ -228,12 +233,12 @@ def unauthorize(address):
         if not is_valid_address(address):
                 return make_response(jsonify({"message": messages.INVALID_ADDRESS}), 400)
         
-        is_authorized = cfp_factory_contract.functions.isAuthorized(w3.to_checksum_address(address)).call()
+        is_authorized = cfp_factory_contract.functions.isAuthorized(checksum(address)).call()
         if not is_authorized:
                 return make_response(jsonify({"message": messages.NOT_AUTHORIZED}), 403)
         
         try:
-                cfp_factory_contract.functions.unauthorize(w3.to_checksum_address(address)).transact({"from": owner.address})
+                cfp_factory_contract.functions.unauthorize(checksum(address)).transact({"from": owner.address})
         except Exception as e:
                 return make_response(jsonify({"message": str(e)}), 500)
         
@@ -439,7 +444,7 @@ def registered(address):
         return make_response(jsonify({"message": messages.INVALID_ADDRESS}), 400)
 
     try:
-        is_registered = cfp_factory_contract.functions.isRegistered(w3.to_checksum_address(address)).call()
+        is_registered = cfp_factory_contract.functions.isRegistered(checksum(address)).call()
         return make_response(jsonify({"registered": is_registered}), 200)
     except Exception as e:
         return make_response(jsonify({"message": str(e)}), 500)
@@ -452,17 +457,6 @@ def was_cfp_created(cfp):
 def is_valid_mimetype(mimetype):
     return mimetype == "application/json"
 
-def is_valid_address(address):
-    return re.match(r"^0x[a-fA-F0-9]{40}$", address)
-
-def is_valid_call_id(call_id):
-    # If it's not a string or doesn't start with 0x, it's not a valid hash
-    if not isinstance(call_id, str) or not call_id.startswith("0x"):
-        return False
-    
-    # If it doesn't match the regex (alphanumeric and 64 characters), it's not a valid hash
-    return re.match(r'^0x[0-9a-fA-F]{64}$', call_id)
-
 @app.get('/resolve/<name>')
 def resolve(name):
     """
@@ -509,7 +503,7 @@ def register_name():
         name_hash = w3.keccak(text=name)
         
         # Ensure owner address is in checksum format
-        owner_checksum = w3.to_checksum_address(owner)
+        owner_checksum = checksum(owner)
         
         # Call the register function of the UserFIFSRegistrar contract
         tx = user_fifs_registrar_contract.functions.register(name_hash, owner_checksum).transact({"from": owner_checksum})
@@ -3,7 +3,6 @@
 import argparse
 import getpass
 import os
-import re
 import sys
 import threading
 from typing import Tuple
@@ -23,40 +22,28 @@ NETWORK_ID = 5777
 SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
 CONFIG_DIR = os.path.abspath(f"{SCRIPT_DIR}/../contracts/build/contracts")
 
-HASH_PATTERN = re.compile(r"0x[0-9a-fA-F]{64}")
+RECEIPT_TIMEOUT = 120
 
-
-def is_valid_hash(string):
-    """Valida que el hash sea una cadena hexadecimal de 32 bytes"""
-    return re.match(HASH_PATTERN, string)
+# La validación de hashes y el seguimiento de transacciones se comparten con el servidor del trabajo final
+sys.path.append(os.path.abspath(f"{SCRIPT_DIR}/../../../Final"))
+from validation import is_valid_hash
+from receipts import ReceiptPoller
 
 
 class Stamper:
     """Clase que se conecta con el contrato de sello de tiempo"""
 
-    def __init__(self, provided_w3, provided_account, abi, address):
+    def __init__(self, provided_w3, provided_account, abi, address, receipts):
         self.web3 = provided_w3
         self.account = provided_account
         self.contract = self.web3.eth.contract(abi=abi, address=address)
         self.lock = threading.Lock()
+        self.receipts = receipts
 
     def get_nonce(self):
         """Obtiene el nonce para la próxima transacción"""
         return self.web3.eth.get_transaction_count(self.account.address)
 
-    def get_error(self, receipt):
-        """Obtiene el error de la transacción"""
-        transaction_hash = self.web3.eth.get_transaction(
-            receipt.transactionHash)
-        transaction_hash = {k: v.hex() if isinstance(
-            v, HexBytes) else v for (k, v) in transaction_hash.items()}
-        transaction_hash['data'] = transaction_hash['input']
-        try:
-            self.web3.eth.call(transaction_hash, receipt.blockNumber)
-            return None
-        except Exception as exception:  # pylint: disable=broad-exception-caught
-            return str(exception)
-
     def stamped(self, hash_value: str) -> Tuple[dict, str]:
         """Obtiene el sello de tiempo de un hash"""
         try:
@@ -68,33 +55,37 @@ class Stamper:
         except Exception as exception:  # pylint: disable=broad-exception-caught
             return (None, str(exception))
 
-    def stamp(self, hash_value: str) -> Tuple[dict, str]:
-        """Sella un hash"""
+    def send(self, hash_value: str) -> HexBytes:
+        """Envía la transacción que sella un hash, sin esperar a que se mine"""
+        with self.lock:
+            nonce = self.get_nonce()
+            transaction = self.contract.functions.stamp(hash_value).build_transaction({
+                'gas': 200000,
+                'gasPrice': w3.to_wei('1', 'gwei'),
+                'nonce': nonce,
+                'from': self.account.address,
+            })
+            gas = self.web3.eth.estimate_gas(transaction)
+            transaction['gas'] = gas
+            signed = self.account.sign_transaction(transaction)
+            return self.web3.eth.send_raw_transaction(signed.rawTransaction)
+
+    def stamp(self, hash_value: str, wait: bool = True) -> Tuple[dict, str]:
+        """Sella un hash. Si `wait` es falso no espera a que se mine la transacción
+        y devuelve el identificador de la tarea que la sigue"""
         try:
-            with self.lock:
-                nonce = self.get_nonce()
-                transaction = self.contract.functions.stamp(hash_value).build_transaction({
-                    'gas': 200000,
-                    'gasPrice': w3.to_wei('1', 'gwei'),
-                    'nonce': nonce,
-                    'from': self.account.address,
-                })
-                gas = self.web3.eth.estimate_gas(transaction)
-                transaction['gas'] = gas
-                signed = self.account.sign_transaction(transaction)
-                transaction_hash = self.web3.eth.send_raw_transaction(
-                    signed.rawTransaction)
-            receipt = self.web3.eth.wait_for_transaction_receipt(
-                transaction_hash)
-            if receipt['status']:
-                err = None
-            else:
-                err = self.get_error(receipt)
+            transaction_hash = self.send(hash_value)
+            job = self.receipts.track(tx_hash=transaction_hash)
+            if not wait:
+                return ({'transaction': transaction_hash.hex(), 'jobId': job.id}, None)
+            # El ReceiptPoller avisa cuando la transacción se mina
+            if not job.wait(RECEIPT_TIMEOUT):
+                return (None, "Internal error: transaction was not mined in time")
+            # Si la transacción revirtió, el ReceiptPoller ya obtuvo el motivo
             return ({
-                    'transaction': transaction_hash.hex(), 
-                    'blockNumber': 
-                    receipt.get('blockNumber')}, 
-                err)
+                    'transaction': transaction_hash.hex(),
+                    'blockNumber': job.block_number},
+                None if job.status == "mined" else job.reason or "Transaction reverted")
         except Exception as exception:  # pylint: disable=broad-exception-caught
             return (None, "Internal error: " + str(exception))
 
@@ -142,7 +133,13 @@ def stamp():
             blockNumber=already_hashed["blockNumber"])
         response.status_code = 403
         return response
-    resp, err = stamper.stamp(hash_value)
+    asynchronous = respond_async()
+    resp, err = stamper.stamp(hash_value, wait=not asynchronous)
+    if resp and asynchronous:
+        response = jsonify(transaction=resp['transaction'], jobId=resp['jobId'])
+        response.status_code = 202
+        response.headers["Location"] = f"/jobs/{resp['jobId']}"
+        return response
     if resp:
         if not err:
             response = jsonify(
@@ -167,6 +164,25 @@ def stamp():
     return response
 
 
+@app.get("/jobs/<job_id>")
+def job_status(job_id):
+    """Obtiene el estado de un sellado asincrónico: pending, mined o reverted"""
+    job = receipt_poller.get(job_id)
+    if job is None:
+        response = jsonify(message="Job not found")
+        response.status_code = 404
+        return response
+    return jsonify(job.to_json())
+
+
+def respond_async():
+    """Indica si el cliente pidió no esperar a que se mine la transacción,
+    con `?async=true` o `Prefer: respond-async`"""
+    if "async" in request.args:
+        return request.args["async"].lower() in ("1", "true", "yes")
+    return "respond-async" in request.headers.get("Prefer", "")
+
+
 @app.get("/contract")
 def contract_address():
     """Obtiene la dirección del contrato"""
@@ -225,7 +241,11 @@ if __name__ == '__main__':
         deployed_hash = stamper_config["networks"][NETWORK_ID]["transactionHash"]
         if stamper_owner.address != w3.eth.get_transaction(deployed_hash)["from"]:
             sys.exit("La cuenta provista no coincide con la creadora de Stamper")
-        stamper = Stamper(w3, stamper_owner, stamper_abi, stamper_address)
+        receipt_poller = ReceiptPoller(w3)
+        stamper = Stamper(w3, stamper_owner, stamper_abi, stamper_address, receipt_poller)
+        # Con debug=True el proceso padre del reloader no atiende pedidos
+        if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+            receipt_poller.start()
         app.run(debug=True)
     except eth_utils.exceptions.ValidationError:
         sys.exit("Frase inválida")